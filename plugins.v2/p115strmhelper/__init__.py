@@ -56,13 +56,16 @@ from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 from watchdog.observers.polling import PollingObserver
 
-from .core.cache import IdPathCache
+from .core.cache import IdPathCache, DownloadUrlCache
+from .core.singleflight import SingleFlight
 from .core.config import configer
+from .core.writer import StrmWriter
 from .core.scrape_metadata import media_scrape_metadata
 from .core.u115_open import U115OpenHelper
 from .db_manager import ct_db_manager
 from .db_manager.init import init_db, update_db
-from .db_manager.oper import FileDbHelper
+from .db_manager.oper import FileDbHelper, LocalFileDbHelper
+from .db_manager.queue import ct_db_write_queue
 from .interactive.framework.callbacks import decode_action, Action
 from .interactive.framework.manager import BaseSessionManager
 from .interactive.framework.schemas import TSession
@@ -122,7 +125,7 @@ class P115StrmHelper(_PluginBase):
     # 插件图标
     plugin_icon = "https://raw.githubusercontent.com/jxxghp/MoviePilot-Frontend/refs/heads/v2/src/assets/images/misc/u115.png"
     # 插件版本
-    plugin_version = "1.8.33"
+    plugin_version = "1.8.34"
     # 插件作者
     plugin_author = "DDSRem"
     # 作者主页
@@ -140,6 +143,14 @@ class P115StrmHelper(_PluginBase):
 
     # 目录ID缓存
     id_path_cache = None
+    # 302跳转下载地址缓存
+    redirect_url_cache = None
+    # 目录路径解析请求合并
+    _cid_path_flight = None
+    # 302跳转下载地址请求合并
+    _redirect_flight = None
+    # 当前生活事件批次中解析失败的目录ID
+    _cid_path_failed = None
 
     # 生活事件缓存
     cache_delete_pan_transfer_list = None
@@ -224,9 +235,6 @@ class P115StrmHelper(_PluginBase):
         if not Path(temp_path).exists():
             Path(temp_path).mkdir(parents=True, exist_ok=True)
 
-        # 初始化数据库
-        self.init_database()
-
         # 实例化处理器和渲染器
         self.action_handler = ActionHandler()
         self.view_renderer = ViewRenderer()
@@ -237,8 +245,10 @@ class P115StrmHelper(_PluginBase):
         """
         self.pathmatchinghelper = PathMatchingHelper()
         self.monitor_stop_event = threading.Event()
+        self._cid_path_flight = SingleFlight()
+        self._redirect_flight = SingleFlight()
+        self._cid_path_failed = set()
 
-        self.id_path_cache = IdPathCache()
         self.cache_delete_pan_transfer_list = []
         self.cache_creata_pan_transfer_list = []
         self.cache_top_delete_pan_transfer_list: Dict[str, List] = {}
@@ -259,11 +269,30 @@ class P115StrmHelper(_PluginBase):
             configer.update_config(config)
             self.__update_config()
 
+        self.strm_writer = StrmWriter(atomic=configer.get_config("strm_writer_atomic"))
+        self.id_path_cache = IdPathCache(
+            maxsize=configer.get_config("id_path_cache_size")
+        )
+        self.redirect_url_cache = DownloadUrlCache(
+            maxsize=configer.get_config("redirect_url_cache_size")
+        )
+
         # 停止现有任务
         self.stop_service()
 
+        # 配置载入后初始化数据库，保证按用户配置创建数据库引擎
+        self.init_database()
+
         if configer.get_config("enabled"):
-            self.init_database()
+            if configer.get_config("db_write_queue_enabled"):
+                ct_db_write_queue.start()
+            self.id_path_cache.preload()
+
+            if configer.get_config("db_extra_reencode"):
+                # 单次执行，执行前关闭开关
+                configer.update_config({"db_extra_reencode": False})
+                self.__update_config()
+                threading.Thread(target=self.reencode_db_extra, daemon=True).start()
 
             try:
                 self._client = P115Client(configer.get_config("cookies"))
@@ -345,9 +374,18 @@ class P115StrmHelper(_PluginBase):
         """
         if not Path(self.__plugin_config_path).exists():
             Path(self.__plugin_config_path).mkdir(parents=True, exist_ok=True)
+        if (
+            ct_db_manager.is_initialized()
+            and ct_db_manager.profile != configer.get_config("db_profile")
+        ):
+            # 数据库性能配置变更，重新初始化数据库引擎
+            ct_db_write_queue.stop()
+            ct_db_manager.close_database()
         if not ct_db_manager.is_initialized():
             # 初始化数据库会话
-            ct_db_manager.init_database(db_path=self.__db_path)
+            ct_db_manager.init_database(
+                db_path=self.__db_path, profile=configer.get_config("db_profile")
+            )
             # 表单补全
             init_db(
                 engine=ct_db_manager.Engine,
@@ -448,6 +486,13 @@ class P115StrmHelper(_PluginBase):
                 "category": "",
                 "data": {"action": "p115_full_sync"},
             },
+            {
+                "cmd": "/p115_rebuild_strm",
+                "event": EventType.PluginAction,
+                "desc": "从数据库重建全量同步STRM",
+                "category": "",
+                "data": {"action": "p115_rebuild_strm"},
+            },
             {
                 "cmd": "/p115_inc_sync",
                 "event": EventType.PluginAction,
@@ -534,6 +579,13 @@ class P115StrmHelper(_PluginBase):
                 "auth": "bear",
                 "summary": "执行全量同步",
             },
+            {
+                "path": "/rebuild_strm",
+                "endpoint": self._trigger_rebuild_strm_api,
+                "methods": ["POST"],
+                "auth": "bear",
+                "summary": "从数据库重建STRM",
+            },
             {
                 "path": "/share_sync",
                 "endpoint": self._trigger_share_sync_api,
@@ -614,6 +666,30 @@ class P115StrmHelper(_PluginBase):
                     "kwargs": {},
                 }
             )
+        if configer.get_config("local_index_enabled") and configer.get_config(
+            "local_index_verify_cron"
+        ):
+            cron_service.append(
+                {
+                    "id": "P115StrmHelper_verify_local_index",
+                    "name": "定期校验本地文件索引",
+                    "trigger": CronTrigger.from_crontab(
+                        configer.get_config("local_index_verify_cron")
+                    ),
+                    "func": self.verify_local_index,
+                    "kwargs": {},
+                }
+            )
+        if configer.get_config("db_profile") != "default":
+            cron_service.append(
+                {
+                    "id": "P115StrmHelper_db_checkpoint",
+                    "name": "数据库WAL检查点",
+                    "trigger": CronTrigger.from_crontab("*/30 * * * *"),
+                    "func": self.db_checkpoint,
+                    "kwargs": {},
+                }
+            )
         if cron_service:
             return cron_service
 
@@ -644,28 +720,167 @@ class P115StrmHelper(_PluginBase):
     def _get_path_by_cid(self, cid: int):
         """
         通过 cid 获取路径
-        先从缓存获取，再从数据库获取，最后通过API获取
+        先从缓存获取（内存、数据库），最后通过API获取
         """
-        _databasehelper = FileDbHelper()
         dir_path = self.id_path_cache.get_dir_by_id(cid)
         if not dir_path:
-            data = _databasehelper.get_by_id(id=cid)
-            if data:
-                dir_path = data.get("path", None)
-                if dir_path:
-                    logger.debug(f"获取 {cid} 路径（数据库）: {dir_path}")
-                    self.id_path_cache.add_cache(id=cid, directory=str(dir_path))
-                    return Path(dir_path)
-            dir_path = get_path_to_cid(self._client, cid=cid)
-            self.id_path_cache.add_cache(id=cid, directory=str(dir_path))
-            if not dir_path:
-                logger.error(f"获取 {cid} 路径失败")
+            if cid in self._cid_path_failed:
                 return None
-            logger.debug(f"获取 {cid} 路径（API）: {dir_path}")
-            return Path(dir_path)
+            # 相同 cid 同时只请求一次API，其余调用共享结果
+            dir_path = self._cid_path_flight.do(cid, self._resolve_path_by_cid, cid)
+            return Path(dir_path) if dir_path else None
         logger.debug(f"获取 {cid} 路径（缓存）: {dir_path}")
         return Path(dir_path)
 
+    def _resolve_path_by_cid(self, cid: int) -> Optional[str]:
+        """
+        通过API获取 cid 路径并写入缓存
+        """
+        dir_path = get_path_to_cid(self._client, cid=cid)
+        if not dir_path:
+            logger.error(f"获取 {cid} 路径失败")
+            self._cid_path_failed.add(cid)
+            return None
+        self.id_path_cache.add_cache(id=cid, directory=str(dir_path))
+        logger.debug(f"获取 {cid} 路径（API）: {dir_path}")
+        return str(dir_path)
+
+    def _preload_event_paths(self, events: List[Dict]):
+        """
+        预先解析一批生活事件的所有上级目录路径
+
+        内存缓存未命中的目录一次查询数据库，仍未命中的每个目录只请求一次API
+        """
+        cids = {
+            int(event["parent_id"])
+            for event in events
+            if int(event["type"]) in (1, 2, 5, 6, 14, 17, 18, 20)
+        }
+        if not cids:
+            return
+        resolved = self.id_path_cache.get_dirs_by_ids(cids)
+        for cid in cids - resolved.keys():
+            try:
+                self._get_path_by_cid(cid)
+            except Exception as e:
+                logger.error(f"【监控生活事件】预解析目录 {cid} 路径失败: {e}")
+                self._cid_path_failed.add(cid)
+
+    def _is_managed_pan_path(self, path: str) -> bool:
+        """
+        判断网盘路径是否位于已配置的同步、监控或整理目录下
+        """
+        for key in (
+            "monitor_life_paths",
+            "full_sync_strm_paths",
+            "increment_sync_strm_paths",
+        ):
+            paths = configer.get_config(key)
+            if paths and self.pathmatchinghelper.get_media_path(paths, path)[0]:
+                return True
+        paths = configer.get_config("pan_transfer_paths")
+        if paths and self.pathmatchinghelper.get_run_transfer_path(paths, path):
+            return True
+        return False
+
+    def _get_event_old_path(self, event) -> Optional[str]:
+        """
+        获取生活事件对应文件或文件夹的原路径
+
+        原路径不在已配置目录下时返回 None，不做后续数据库处理；
+        文件夹仍清理内存路径缓存，避免移入配置目录后使用过期路径
+        """
+        is_dir = int(event["file_category"]) == 0
+        if is_dir:
+            old_path = self.id_path_cache.get_dir_by_id(int(event["file_id"]))
+        else:
+            data = FileDbHelper().get_by_id(int(event["file_id"]), table="files")
+            old_path = data.get("path") if data else None
+        if not old_path or self._is_managed_pan_path(old_path):
+            return old_path
+        if is_dir:
+            self.id_path_cache.invalidate_subtree(old_path)
+        return None
+
+    def _move_local_dir(self, old_path: str, new_path: str):
+        """
+        网盘文件夹移动或重命名时，同步移动生活事件监控目录下生成的本地目录
+        """
+        paths = configer.get_config("monitor_life_paths")
+        if (
+            not configer.get_config("monitor_life_enabled")
+            or not paths
+            or "creata" not in (configer.get_config("monitor_life_event_modes") or [])
+        ):
+            return
+        old_status, old_target, old_pan = self.pathmatchinghelper.get_media_path(
+            paths, old_path
+        )
+        new_status, new_target, new_pan = self.pathmatchinghelper.get_media_path(
+            paths, new_path
+        )
+        if not old_status or not new_status:
+            return
+        if Path(old_path) == Path(old_pan) or Path(new_path) == Path(new_pan):
+            # 不移动媒体库根目录
+            return
+        old_local = Path(old_target) / Path(old_path).relative_to(old_pan)
+        new_local = Path(new_target) / Path(new_path).relative_to(new_pan)
+        if old_local == new_local or not old_local.is_dir():
+            return
+        if new_local.exists():
+            logger.warn(
+                f"【监控生活事件】本地目录 {new_local} 已存在，跳过移动 {old_local}"
+            )
+            return
+        try:
+            new_local.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(old_local, new_local)
+            LocalFileDbHelper().move_dir(old_local, new_local)
+            logger.info(f"【监控生活事件】本地目录 {old_local} 已移动到 {new_local}")
+        except Exception as e:
+            logger.error(f"【监控生活事件】本地目录 {old_local} 移动失败: {e}")
+
+    def _invalidate_path_event(self, event, old_path: Optional[str]):
+        """
+        根据移动、重命名、删除事件修正路径缓存与数据库路径
+
+        文件夹移动或重命名时整体替换其下所有路径，删除时清理其下所有缓存
+
+        删除事件的数据库记录由 remove_strm 清理
+        """
+        if not old_path:
+            return
+        _databasehelper = FileDbHelper()
+        file_id = int(event["file_id"])
+        is_dir = int(event["file_category"]) == 0
+        if int(event["type"]) == 22:
+            if is_dir:
+                self.id_path_cache.invalidate_subtree(old_path)
+            logger.debug(f"【监控生活事件】清理已删除路径缓存: {old_path}")
+        else:
+            dir_path = self._get_path_by_cid(int(event["parent_id"]))
+            if not dir_path:
+                return
+            new_path = str(Path(dir_path) / event["file_name"])
+            if new_path == old_path:
+                return
+            if is_dir:
+                self.id_path_cache.invalidate_subtree(old_path)
+                _databasehelper.move_path(old_path, new_path)
+                self.id_path_cache.add_cache(id=file_id, directory=new_path)
+                self._move_local_dir(old_path, new_path)
+            else:
+                _databasehelper.update_path_by_id(id=file_id, new_path=new_path)
+                _databasehelper.update_name_by_id(
+                    id=file_id, new_name=event["file_name"]
+                )
+            LocalFileDbHelper().move_pan_path(old_path, new_path)
+            logger.debug(f"【监控生活事件】修正路径缓存: {old_path} -> {new_path}")
+        browse_cache = getattr(self._browse_dir_api, "cache", None)
+        if browse_cache is not None:
+            browse_cache.clear()
+
     def media_transfer(self, event, file_path: Path, rmt_mediaext):
         """
         运行媒体文件整理
@@ -1012,9 +1227,7 @@ class P115StrmHelper(_PluginBase):
                 file_path = Path(target_dir) / pan_path
                 file_name = basename + ".strm"
                 new_file_path = file_path / file_name
-                new_file_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(new_file_path, "w", encoding="utf-8") as file:
-                    file.write(url)
+                self.strm_writer.write(new_file_path, url)
                 logger.info(
                     "【监控整理STRM生成】生成 STRM 文件成功: %s", str(new_file_path)
                 )
@@ -1098,7 +1311,7 @@ class P115StrmHelper(_PluginBase):
             strm_url += f"&file_name={item_dest_name}"
 
         _databasehelper = FileDbHelper()
-        _databasehelper.upsert_batch(
+        _databasehelper.enqueue_upsert_batch(
             _databasehelper.process_fileitem(fileitem=item_transfer.target_item)
         )
 
@@ -1111,6 +1324,11 @@ class P115StrmHelper(_PluginBase):
         )
         if not status:
             return
+        local_index_list = [
+            LocalFileDbHelper.process_item(
+                strm_target_path, item_dest_path, item_dest_pickcode
+            )
+        ]
 
         try:
             storagechain = StorageChain()
@@ -1120,7 +1338,7 @@ class P115StrmHelper(_PluginBase):
                     fileitem = storagechain.get_file_item(
                         storage="u115", path=Path(_path)
                     )
-                    _databasehelper.upsert_batch(
+                    _databasehelper.enqueue_upsert_batch(
                         _databasehelper.process_fileitem(fileitem)
                     )
                     download_url = self.mediainfodownloader.get_download_url(
@@ -1138,6 +1356,9 @@ class P115StrmHelper(_PluginBase):
                         file_path=Path(_file_path),
                         file_name=_file_path.name,
                         download_url=download_url,
+                        pan_path=_path,
+                        pickcode=fileitem.pickcode,
+                        local_index_list=local_index_list,
                     )
 
             if audio_list:
@@ -1146,7 +1367,7 @@ class P115StrmHelper(_PluginBase):
                     fileitem = storagechain.get_file_item(
                         storage="u115", path=Path(_path)
                     )
-                    _databasehelper.upsert_batch(
+                    _databasehelper.enqueue_upsert_batch(
                         _databasehelper.process_fileitem(fileitem)
                     )
                     download_url = self.mediainfodownloader.get_download_url(
@@ -1164,9 +1385,13 @@ class P115StrmHelper(_PluginBase):
                         file_path=Path(_file_path),
                         file_name=_file_path.name,
                         download_url=download_url,
+                        pan_path=_path,
+                        pickcode=fileitem.pickcode,
+                        local_index_list=local_index_list,
                     )
         except Exception as e:
             logger.error(f"【监控整理STRM生成】媒体信息文件下载出现未知错误: {e}")
+        LocalFileDbHelper().add_batch(local_index_list)
 
         scrape_metadata = True
         if configer.get_config("transfer_monitor_scrape_metadata_enabled"):
@@ -1251,6 +1476,23 @@ class P115StrmHelper(_PluginBase):
         )
         self.full_sync_strm_files()
 
+    @eventmanager.register(EventType.PluginAction)
+    def p115_rebuild_strm(self, event: Event):
+        """
+        远程从数据库重建 STRM
+        """
+        if not event:
+            return
+        event_data = event.event_data
+        if not event_data or event_data.get("action") != "p115_rebuild_strm":
+            return
+        self.post_message(
+            channel=event.event_data.get("channel"),
+            title="开始从数据库重建115网盘媒体库 STRM ...",
+            userid=event.event_data.get("user"),
+        )
+        self.full_sync_strm_files(from_db=True)
+
     @eventmanager.register(EventType.PluginAction)
     def p115_inc_sync(self, event: Event):
         """
@@ -1322,6 +1564,13 @@ class P115StrmHelper(_PluginBase):
             strm_url_format=configer.get_config("strm_url_format"),
             overwrite_mode=configer.get_config("full_sync_overwrite_mode"),
             remove_unless_strm=configer.get_config("full_sync_remove_unless_strm"),
+            tree_diff_mode=configer.get_config("sync_tree_diff_mode"),
+            local_index_enabled=configer.get_config("local_index_enabled"),
+            strm_writer=StrmWriter(
+                max_workers=configer.get_config("strm_writer_workers"),
+                atomic=configer.get_config("strm_writer_atomic"),
+            ),
+            db_staging=configer.get_config("full_sync_db_staging_enabled"),
         )
         self.post_message(
             channel=event.event_data.get("channel"),
@@ -1337,6 +1586,7 @@ class P115StrmHelper(_PluginBase):
             strm_fail_count,
             mediainfo_fail_count,
             remove_unless_strm_count,
+            strm_unchanged_count,
         ) = strm_helper.get_generate_total()
         text = f"""
 📂 网盘路径：{args}
@@ -1345,6 +1595,8 @@ class P115StrmHelper(_PluginBase):
 ❌ 生成STRM失败 {strm_fail_count} 个
 🚫 下载媒体失败 {mediainfo_fail_count} 个
 """
+        if strm_unchanged_count != 0:
+            text += f"⏭️ 内容未变化STRM文件 {strm_unchanged_count} 个\n"
         if remove_unless_strm_count != 0:
             text += f"🗑️ 清理无效STRM文件 {remove_unless_strm_count} 个"
         self.post_message(
@@ -1787,9 +2039,11 @@ class P115StrmHelper(_PluginBase):
         )
         return
 
-    def full_sync_strm_files(self):
+    def full_sync_strm_files(self, from_db: bool = False):
         """
         全量同步
+
+        :param from_db: 仅使用数据库数据重建 STRM 文件，不请求115接口
         """
         if (
             not configer.get_config("full_sync_strm_paths")
@@ -1812,16 +2066,29 @@ class P115StrmHelper(_PluginBase):
             strm_url_format=configer.get_config("strm_url_format"),
             overwrite_mode=configer.get_config("full_sync_overwrite_mode"),
             remove_unless_strm=configer.get_config("full_sync_remove_unless_strm"),
+            tree_diff_mode=configer.get_config("sync_tree_diff_mode"),
+            local_index_enabled=configer.get_config("local_index_enabled"),
+            strm_writer=StrmWriter(
+                max_workers=configer.get_config("strm_writer_workers"),
+                atomic=configer.get_config("strm_writer_atomic"),
+            ),
+            db_staging=configer.get_config("full_sync_db_staging_enabled"),
         )
-        strm_helper.generate_strm_files(
-            full_sync_strm_paths=configer.get_config("full_sync_strm_paths"),
-        )
+        if from_db:
+            strm_helper.rebuild_strm_files(
+                full_sync_strm_paths=configer.get_config("full_sync_strm_paths"),
+            )
+        else:
+            strm_helper.generate_strm_files(
+                full_sync_strm_paths=configer.get_config("full_sync_strm_paths"),
+            )
         (
             strm_count,
             mediainfo_count,
             strm_fail_count,
             mediainfo_fail_count,
             remove_unless_strm_count,
+            strm_unchanged_count,
         ) = strm_helper.get_generate_total()
         if configer.get_config("notify"):
             text = f"""
@@ -1830,11 +2097,15 @@ class P115StrmHelper(_PluginBase):
 ❌ 生成STRM失败 {strm_fail_count} 个
 🚫 下载媒体失败 {mediainfo_fail_count} 个
 """
+            if strm_unchanged_count != 0:
+                text += f"⏭️ 内容未变化STRM文件 {strm_unchanged_count} 个\n"
             if remove_unless_strm_count != 0:
                 text += f"🗑️ 清理无效STRM文件 {remove_unless_strm_count} 个"
             self.post_message(
                 mtype=NotificationType.Plugin,
-                title="✅【115网盘】全量生成 STRM 文件完成",
+                title="✅【115网盘】从数据库重建 STRM 文件完成"
+                if from_db
+                else "✅【115网盘】全量生成 STRM 文件完成",
                 text=text,
             )
 
@@ -1875,6 +2146,11 @@ class P115StrmHelper(_PluginBase):
                 "increment_sync_media_server_refresh_enabled"
             ),
             mediaservers=configer.get_config("increment_sync_mediaservers"),
+            snapshot_enabled=configer.get_config("increment_sync_snapshot_enabled"),
+            snapshot_ttl=configer.get_config("increment_sync_snapshot_ttl"),
+            tree_diff_mode=configer.get_config("sync_tree_diff_mode"),
+            local_index_enabled=configer.get_config("local_index_enabled"),
+            strm_writer=StrmWriter(atomic=configer.get_config("strm_writer_atomic")),
         )
         strm_helper.generate_strm_files(
             sync_strm_paths=configer.get_config("increment_sync_strm_paths"),
@@ -1945,6 +2221,9 @@ class P115StrmHelper(_PluginBase):
                 local_media_path=configer.get_config("user_share_local_path"),
                 strm_url_format=configer.get_config("strm_url_format"),
                 mediainfodownloader=self.mediainfodownloader,
+                strm_writer=StrmWriter(
+                    atomic=configer.get_config("strm_writer_atomic")
+                ),
             )
             strm_helper.get_share_list_creata_strm(
                 cid=0,
@@ -2039,6 +2318,7 @@ class P115StrmHelper(_PluginBase):
                     if target_file_path.exists():
                         target_file_path.unlink(missing_ok=True)
                     life_path.rename(target_file_path)
+                    LocalFileDbHelper().rename(life_path, target_file_path)
                     _databasehelper.update_path_by_id(
                         id=int(fileitem.fileid),
                         new_path=str(target_path / fileitem.name),
@@ -2214,6 +2494,7 @@ class P115StrmHelper(_PluginBase):
             创建 STRM 文件
             """
             _databasehelper = FileDbHelper()
+            _localfilehelper = LocalFileDbHelper()
 
             pickcode = event["pick_code"]
             file_category = event["file_category"]
@@ -2229,7 +2510,7 @@ class P115StrmHelper(_PluginBase):
                 # 文件夹情况，遍历文件夹
                 mediainfo_count = 0
                 strm_count = 0
-                _databasehelper.upsert_batch(
+                _databasehelper.enqueue_upsert_batch(
                     _databasehelper.process_life_dir_item(
                         event=event, file_path=file_path
                     )
@@ -2239,10 +2520,10 @@ class P115StrmHelper(_PluginBase):
                     7_000,
                 ):
                     processed = []
+                    seen = set()
+                    local_index_list = []
                     for item in batch:
-                        _process_item = _databasehelper.process_item(item)
-                        if _process_item not in processed:
-                            processed.extend(_process_item)
+                        processed.extend(_databasehelper.process_item(item, seen))
                         if item["is_dir"] or item["is_directory"]:
                             continue
                         if "creata" in configer.get_config("monitor_life_event_modes"):
@@ -2281,6 +2562,9 @@ class P115StrmHelper(_PluginBase):
                                         file_path=Path(file_path),
                                         file_name=original_file_name,
                                         download_url=download_url,
+                                        pan_path=item["path"],
+                                        pickcode=pickcode,
+                                        local_index_list=local_index_list,
                                     )
                                     mediainfo_count += 1
                                     continue
@@ -2296,8 +2580,6 @@ class P115StrmHelper(_PluginBase):
                             if not pickcode:
                                 pickcode = item["pick_code"]
 
-                            new_file_path.parent.mkdir(parents=True, exist_ok=True)
-
                             if not pickcode:
                                 logger.error(
                                     f"【监控生活事件】{original_file_name} 不存在 pickcode 值，无法生成 STRM 文件"
@@ -2312,8 +2594,12 @@ class P115StrmHelper(_PluginBase):
                             if configer.get_config("strm_url_format") == "pickname":
                                 strm_url += f"&file_name={original_file_name}"
 
-                            with open(new_file_path, "w", encoding="utf-8") as file:
-                                file.write(strm_url)
+                            self.strm_writer.write(new_file_path, strm_url)
+                            local_index_list.append(
+                                _localfilehelper.process_item(
+                                    new_file_path, item["path"], pickcode
+                                )
+                            )
                             logger.info(
                                 "【监控生活事件】生成 STRM 文件成功: %s",
                                 str(new_file_path),
@@ -2344,7 +2630,8 @@ class P115StrmHelper(_PluginBase):
                             refresh_mediaserver(
                                 str(new_file_path), str(original_file_name)
                             )
-                    _databasehelper.upsert_batch(processed)
+                    _databasehelper.enqueue_upsert_batch(processed)
+                    _localfilehelper.add_batch(local_index_list)
                 if configer.get_config("notify"):
                     if strm_count > 0 or mediainfo_count > 0:
                         self._monitor_life_notification_queue["life"]["strm_count"] += (
@@ -2355,13 +2642,14 @@ class P115StrmHelper(_PluginBase):
                         ] += mediainfo_count
                         _schedule_notification()
             else:
-                _databasehelper.upsert_batch(
+                _databasehelper.enqueue_upsert_batch(
                     _databasehelper.process_life_file_item(
                         event=event, file_path=file_path
                     )
                 )
                 if "creata" in configer.get_config("monitor_life_event_modes"):
                     # 文件情况，直接生成
+                    pan_file_path = file_path
                     file_path = Path(target_dir) / Path(file_path).relative_to(
                         pan_media_dir
                     )
@@ -2393,6 +2681,8 @@ class P115StrmHelper(_PluginBase):
                                 file_path=Path(file_path),
                                 file_name=original_file_name,
                                 download_url=download_url,
+                                pan_path=pan_file_path,
+                                pickcode=pickcode,
                             )
                             # 下载的元数据写入缓存，与整理事件对比
                             self.cache_create_strm_file_dict[str(event["file_id"])] = [
@@ -2414,8 +2704,6 @@ class P115StrmHelper(_PluginBase):
                         )
                         return
 
-                    new_file_path.parent.mkdir(parents=True, exist_ok=True)
-
                     if not pickcode:
                         logger.error(
                             f"【监控生活事件】{original_file_name} 不存在 pickcode 值，无法生成 STRM 文件"
@@ -2430,8 +2718,8 @@ class P115StrmHelper(_PluginBase):
                     if configer.get_config("strm_url_format") == "pickname":
                         strm_url += f"&file_name={original_file_name}"
 
-                    with open(new_file_path, "w", encoding="utf-8") as file:
-                        file.write(strm_url)
+                    self.strm_writer.write(new_file_path, strm_url)
+                    _localfilehelper.add(new_file_path, pan_file_path, pickcode)
                     logger.info(
                         "【监控生活事件】生成 STRM 文件成功: %s", str(new_file_path)
                     )
@@ -2563,7 +2851,7 @@ class P115StrmHelper(_PluginBase):
                     f"【监控生活事件】网盘 {file_path} 目录存在，跳过本地删除: {fileitem}"
                 )
                 # 这里如果路径存在则更新数据库信息
-                _databasehelper.upsert_batch(
+                _databasehelper.enqueue_upsert_batch(
                     _databasehelper.process_fileitem(fileitem=fileitem)
                 )
                 return
@@ -2582,10 +2870,12 @@ class P115StrmHelper(_PluginBase):
                     return
                 if file_category == 0:
                     shutil.rmtree(Path(file_path))
+                    LocalFileDbHelper().remove_dir(file_path)
                 else:
                     Path(file_path).unlink(missing_ok=True)
+                    LocalFileDbHelper().remove(file_path)
                     __remove_parent_dir(Path(file_path))
-                _databasehelper.remove_by_path_batch(str(pan_file_path))
+                _databasehelper.enqueue_remove_by_path_batch(str(pan_file_path))
                 logger.info(f"【监控生活事件】{file_path} 已删除")
             except Exception as e:
                 logger.error(f"【监控生活事件】{file_path} 删除失败: {e}")
@@ -2661,6 +2951,8 @@ class P115StrmHelper(_PluginBase):
                 if not events_batch:
                     time.sleep(20)
                     continue
+                self._cid_path_failed.clear()
+                self._preload_event_paths(events_batch)
                 for event in reversed(events_batch):
                     rmt_mediaext = [
                         f".{ext.strip()}"
@@ -2682,10 +2974,18 @@ class P115StrmHelper(_PluginBase):
                         and int(event["type"]) != 14
                         and int(event["type"]) != 17
                         and int(event["type"]) != 18
+                        and int(event["type"]) != 20
                         and int(event["type"]) != 22
                     ):
                         continue
 
+                    old_path = None
+                    if int(event["type"]) in (6, 20, 22):
+                        # 移动、重命名、删除事件，记录原路径用于修正缓存
+                        old_path = self._get_event_old_path(event)
+                    if int(event["type"]) in (6, 20):
+                        self._invalidate_path_event(event, old_path)
+
                     if (
                         int(event["type"]) == 1
                         or int(event["type"]) == 2
@@ -2712,6 +3012,7 @@ class P115StrmHelper(_PluginBase):
                                 in configer.get_config("monitor_life_event_modes")
                             ):
                                 remove_strm(event=event)
+                        self._invalidate_path_event(event, old_path)
 
                     if int(event["type"]) == 17:
                         # 对于创建文件夹事件直接写入数据库
@@ -2719,7 +3020,7 @@ class P115StrmHelper(_PluginBase):
                         file_name = event["file_name"]
                         dir_path = self._get_path_by_cid(int(event["parent_id"]))
                         file_path = Path(dir_path) / file_name
-                        _databasehelper.upsert_batch(
+                        _databasehelper.enqueue_upsert_batch(
                             _databasehelper.process_life_dir_item(
                                 event=event, file_path=file_path
                             )
@@ -2733,6 +3034,82 @@ class P115StrmHelper(_PluginBase):
         logger.info("【监控生活事件】已退出生活事件监控")
         return
 
+    @staticmethod
+    def db_checkpoint():
+        """
+        执行数据库 WAL 检查点
+        """
+        if not ct_db_manager.is_initialized():
+            return
+        try:
+            result = ct_db_manager.checkpoint()
+            if result:
+                logger.debug(f"【数据库】WAL 检查点完成: {tuple(result)}")
+        except Exception as e:
+            logger.warning(f"【数据库】WAL 检查点执行失败: {e}")
+
+    @staticmethod
+    def reencode_db_extra():
+        """
+        按当前存储模式重新编码已有 extra 数据并回收数据库空间
+        """
+        if not ct_db_manager.is_initialized():
+            return
+        logger.info(
+            f"【数据库】开始重新编码文件附加数据，存储模式: {configer.get_config('db_extra_mode')}"
+        )
+        try:
+            count = FileDbHelper().reencode_extra()
+            ct_db_manager.vacuum()
+            logger.info(f"【数据库】文件附加数据重新编码完成，修改 {count} 条数据")
+        except Exception as e:
+            logger.error(f"【数据库】文件附加数据重新编码失败: {e}")
+
+    def verify_local_index(self):
+        """
+        扫描本地媒体库校验本地文件索引
+        """
+        local_dirs = set()
+        for key in [
+            "full_sync_strm_paths",
+            "increment_sync_strm_paths",
+            "monitor_life_paths",
+            "transfer_monitor_paths",
+        ]:
+            paths = configer.get_config(key)
+            if not paths:
+                continue
+            for path in paths.split("\n"):
+                if not path or "#" not in path:
+                    continue
+                local_dirs.add(path.split("#", 1)[0].rstrip("/"))
+        if configer.get_config("user_share_local_path"):
+            local_dirs.add(configer.get_config("user_share_local_path").rstrip("/"))
+
+        extensions = [".strm"] + [
+            f".{ext.strip()}"
+            for ext in configer.get_config("user_download_mediaext")
+            .replace("，", ",")
+            .split(",")
+        ]
+        tree_file = (
+            settings.PLUGIN_DATA_PATH / "p115strmhelper" / "temp" / "verify_tree.txt"
+        )
+        _localfilehelper = LocalFileDbHelper()
+        for local_dir in local_dirs:
+            if not local_dir or not Path(local_dir).exists():
+                continue
+            try:
+                added, removed = _localfilehelper.verify(
+                    local_dir=local_dir, tree_file=tree_file, extensions=extensions
+                )
+                logger.info(
+                    f"【本地文件索引】{local_dir} 校验完成，新增 {added} 条，删除 {removed} 条"
+                )
+            except Exception as e:
+                logger.error(f"【本地文件索引】{local_dir} 校验失败: {e}")
+        Path(tree_file).unlink(missing_ok=True)
+
     def main_cleaner(self):
         """
         主清理模块
@@ -2794,6 +3171,7 @@ class P115StrmHelper(_PluginBase):
                     self._event.clear()
                 self._scheduler = None
             self.monitor_stop_event.set()
+            ct_db_write_queue.stop()
         except Exception as e:
             print(str(e))
 
@@ -2959,6 +3337,19 @@ class P115StrmHelper(_PluginBase):
             "code": 0,
             "data": {
                 "enabled": configer.get_config("enabled"),
+                "id_path_cache": (
+                    self.id_path_cache.stats() if self.id_path_cache else None
+                ),
+                "redirect_url_cache": (
+                    self.redirect_url_cache.stats()
+                    if self.redirect_url_cache
+                    else None
+                ),
+                "redirect_coalesced_count": (
+                    self._redirect_flight.coalesced_count
+                    if self._redirect_flight
+                    else 0
+                ),
                 "has_client": bool(self._client),
                 "running": (
                     bool(self._scheduler.get_jobs()) if self._scheduler else False
@@ -2994,6 +3385,33 @@ class P115StrmHelper(_PluginBase):
         except Exception as e:
             return {"code": 1, "msg": f"启动全量同步任务失败: {str(e)}"}
 
+    def _trigger_rebuild_strm_api(self) -> Dict:
+        """
+        触发从数据库重建 STRM
+        """
+        try:
+            if not configer.get_config("enabled"):
+                return {"code": 1, "msg": "插件未启用"}
+
+            # 复用已有任务调度器，避免覆盖正在运行的调度器
+            if not self._scheduler:
+                self._scheduler = BackgroundScheduler(timezone=settings.TZ)
+            self._scheduler.add_job(
+                func=self.full_sync_strm_files,
+                kwargs={"from_db": True},
+                trigger="date",
+                run_date=datetime.now(tz=pytz.timezone(settings.TZ))
+                + timedelta(seconds=3),
+                name="115网盘助手从数据库重建STRM",
+            )
+            if not self._scheduler.running:
+                self._scheduler.print_jobs()
+                self._scheduler.start()
+
+            return {"code": 0, "msg": "从数据库重建STRM任务已启动"}
+        except Exception as e:
+            return {"code": 1, "msg": f"启动从数据库重建STRM任务失败: {str(e)}"}
+
     def _trigger_share_sync_api(self) -> Dict:
         """
         触发分享同步
@@ -3293,7 +3711,6 @@ class P115StrmHelper(_PluginBase):
             uid=uid, _time=_time, sign=sign, client_type=client_type
         )
 
-    @cached(cache=TTLCache(maxsize=48, ttl=2 * 60))
     def _redirect_url(
         self,
         request: Request,
@@ -3455,26 +3872,15 @@ class P115StrmHelper(_PluginBase):
             url = Url.of(url_info["url"], data)
             return url
 
+        user_agent = request.headers.get("User-Agent") or b""
         if share_code:
-            try:
-                if not receive_code:
-                    receive_code = get_receive_code(share_code)
-                elif len(receive_code) != 4:
-                    return f"Bad receive_code: {receive_code}"
-                if not id:
-                    if file_name:
-                        id = share_get_id_for_name(
-                            share_code,
-                            receive_code,
-                            file_name,
-                        )
-                if not id:
-                    return f"Please specify id or name: share_code={share_code!r}"
-                url = get_share_downurl(share_code, receive_code, id, app=app)
-                logger.info(f"【302跳转服务】获取 115 下载地址成功: {url}")
-            except Exception as e:
-                logger.error(f"【302跳转服务】获取 115 下载地址失败: {e}")
-                return f"获取 115 下载地址失败: {e}"
+            cache_key = DownloadUrlCache.make_key(
+                share_code=share_code,
+                receive_code=receive_code,
+                file_id=id or file_name,
+                user_agent=user_agent,
+                app=app,
+            )
         else:
             if not pickcode:
                 logger.debug("【302跳转服务】Missing pickcode parameter")
@@ -3484,24 +3890,65 @@ class P115StrmHelper(_PluginBase):
                 logger.debug(f"【302跳转服务】Bad pickcode: {pickcode} {file_name}")
                 return f"Bad pickcode: {pickcode} {file_name}"
 
-            user_agent = request.headers.get("User-Agent") or b""
-            logger.debug(f"【302跳转服务】获取到客户端UA: {user_agent}")
+            cache_key = DownloadUrlCache.make_key(
+                pickcode=pickcode,
+                user_agent=user_agent,
+                app=app,
+                mode=configer.get_config("link_redirect_mode"),
+            )
+
+        url = self.redirect_url_cache.get(cache_key)
+        if url:
+            logger.info(f"【302跳转服务】命中 115 下载地址缓存: {url}")
+        elif share_code:
+            if receive_code and len(receive_code) != 4:
+                return f"Bad receive_code: {receive_code}"
+            if not id and not file_name:
+                return f"Please specify id or name: share_code={share_code!r}"
+
+            def fetch_share_downurl() -> Url:
+                """
+                获取分享文件下载链接
+                """
+                _receive_code = receive_code or get_receive_code(share_code)
+                file_id = id or share_get_id_for_name(
+                    share_code,
+                    _receive_code,
+                    file_name,
+                )
+                return get_share_downurl(share_code, _receive_code, file_id, app=app)
 
             try:
+                # 相同文件并发请求只获取一次下载链接
+                url = self._redirect_flight.do(cache_key, fetch_share_downurl)
+                logger.info(f"【302跳转服务】获取 115 下载地址成功: {url}")
+                self.redirect_url_cache.set(cache_key, url)
+            except Exception as e:
+                logger.error(f"【302跳转服务】获取 115 下载地址失败: {e}")
+                return f"获取 115 下载地址失败: {e}"
+        else:
+            logger.debug(f"【302跳转服务】获取到客户端UA: {user_agent}")
+
+            def fetch_downurl() -> Url:
+                """
+                获取文件下载链接
+                """
                 if configer.get_config("link_redirect_mode") == "cookie":
-                    url = get_downurl(pickcode.lower(), user_agent, app=app)
-                else:
-                    resp_url = self.u115openhelper.get_download_url(
-                        pickcode=pickcode.lower(), user_agent=user_agent
-                    )
-                    data: Dict = {}
-                    data["file_name"] = unquote(
-                        urlsplit(resp_url).path.rpartition("/")[-1]
-                    )
-                    url = Url.of(resp_url, data)
+                    return get_downurl(pickcode.lower(), user_agent, app=app)
+                resp_url = self.u115openhelper.get_download_url(
+                    pickcode=pickcode.lower(), user_agent=user_agent
+                )
+                data: Dict = {}
+                data["file_name"] = unquote(urlsplit(resp_url).path.rpartition("/")[-1])
+                return Url.of(resp_url, data)
+
+            try:
+                # 相同文件并发请求只获取一次下载链接
+                url = self._redirect_flight.do(cache_key, fetch_downurl)
                 logger.info(
                     f"【302跳转服务】获取 115 下载地址成功: {url} {url['file_name']}"
                 )
+                self.redirect_url_cache.set(cache_key, url)
             except Exception as e:
                 logger.error(f"【302跳转服务】获取 115 下载地址失败: {e}")
                 return f"获取 115 下载地址失败: {e}"
@@ -1,37 +1,330 @@
-from cachetools import LRUCache
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from cachetools import TLRUCache
+
+from app.log import logger
+
+from ..db_manager.oper import FileDbHelper
 
 
 class IdPathCache:
     """
-    文件路径ID缓存
+    文件夹路径ID双向缓存
+
+    第一级为内存 LRU 缓存，ID 与路径共用同一条记录，淘汰时同步移除；
+    第二级为数据库 folders 表，内存未命中时查询并回填
+
+    另外维护有序路径列表，按前缀范围二分查找子路径
     """
 
-    def __init__(self, maxsize=128):
-        self.id_to_dir = LRUCache(maxsize=maxsize)
-        self.dir_to_id = LRUCache(maxsize=maxsize)
+    def __init__(self, maxsize: int = 100_000, db_fallback: bool = True):
+        """
+        :param maxsize: 内存缓存最大条目数
+        :param db_fallback: 内存未命中时是否查询数据库
+        """
+        self.maxsize = max(int(maxsize or 0), 1)
+        self.db_fallback = db_fallback
+        self.id_to_dir: OrderedDict[int, str] = OrderedDict()
+        self.dir_to_id: Dict[str, int] = {}
+        self._sorted_dirs: List[str] = []
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._databasehelper = FileDbHelper()
 
-    def add_cache(self, id: int, directory: str):
+    def __del_dir(self, directory: str):
         """
-        添加缓存
+        删除路径映射及其有序索引
+        """
+        del self.dir_to_id[directory]
+        index = bisect_left(self._sorted_dirs, directory)
+        if index < len(self._sorted_dirs) and self._sorted_dirs[index] == directory:
+            del self._sorted_dirs[index]
+
+    def __put(self, id: int, directory: str):
+        """
+        写入内存缓存，保证双向映射一致
         """
+        old_dir = self.id_to_dir.pop(id, None)
+        if old_dir is not None and self.dir_to_id.get(old_dir) == id:
+            self.__del_dir(old_dir)
+        old_id = self.dir_to_id.get(directory)
+        if old_id is None:
+            insort(self._sorted_dirs, directory)
+        elif old_id != id:
+            self.id_to_dir.pop(old_id, None)
         self.id_to_dir[id] = directory
         self.dir_to_id[directory] = id
+        while len(self.id_to_dir) > self.maxsize:
+            evicted_id, evicted_dir = self.id_to_dir.popitem(last=False)
+            if self.dir_to_id.get(evicted_dir) == evicted_id:
+                self.__del_dir(evicted_dir)
+
+    def add_cache(self, id: int, directory: str):
+        """
+        添加缓存
+        """
+        with self._lock:
+            self.__put(int(id), str(directory))
 
-    def get_dir_by_id(self, id: int):
+    def get_dir_by_id(self, id: int) -> Optional[str]:
         """
         通过 ID 获取路径
         """
-        return self.id_to_dir.get(id)
+        id = int(id)
+        with self._lock:
+            directory = self.id_to_dir.get(id)
+            if directory is not None:
+                self.id_to_dir.move_to_end(id)
+                self.hits += 1
+                return directory
+        if self.db_fallback:
+            data = self._databasehelper.get_row("id", id, "folders", ["path"])
+            if data and data.get("path"):
+                with self._lock:
+                    self.db_hits += 1
+                    self.__put(id, data["path"])
+                return data["path"]
+        with self._lock:
+            self.misses += 1
+        return None
 
-    def get_id_by_dir(self, directory: str):
+    def get_id_by_dir(self, directory: str) -> Optional[int]:
         """
         通过路径获取 ID
         """
-        return self.dir_to_id.get(directory)
+        directory = str(directory)
+        with self._lock:
+            id = self.dir_to_id.get(directory)
+            if id is not None:
+                self.id_to_dir.move_to_end(id)
+                self.hits += 1
+                return id
+        if self.db_fallback:
+            data = self._databasehelper.get_row("path", directory, "folders", ["id"])
+            if data and data.get("id") is not None:
+                with self._lock:
+                    self.db_hits += 1
+                    self.__put(int(data["id"]), directory)
+                return int(data["id"])
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get_dirs_by_ids(self, ids: Iterable[int]) -> Dict[int, str]:
+        """
+        批量通过 ID 获取路径 {ID: 路径}，内存未命中的 ID 一次查询数据库
+        """
+        result: Dict[int, str] = {}
+        missing = []
+        with self._lock:
+            for id in {int(i) for i in ids}:
+                directory = self.id_to_dir.get(id)
+                if directory is None:
+                    missing.append(id)
+                    continue
+                self.id_to_dir.move_to_end(id)
+                self.hits += 1
+                result[id] = directory
+        found = 0
+        if missing and self.db_fallback:
+            rows = self._databasehelper.get_rows_by_ids(missing, "folders", ["path"])
+            with self._lock:
+                for id, row in rows.items():
+                    if row["path"]:
+                        found += 1
+                        self.__put(id, row["path"])
+                        result[id] = row["path"]
+        with self._lock:
+            self.db_hits += found
+            self.misses += len(missing) - found
+        return result
+
+    def remove_by_id(self, id: int):
+        """
+        删除指定 ID 的缓存
+        """
+        with self._lock:
+            directory = self.id_to_dir.pop(int(id), None)
+            if directory is not None and self.dir_to_id.get(directory) == int(id):
+                self.__del_dir(directory)
+
+    def invalidate_subtree(self, directory: str) -> int:
+        """
+        删除路径及其所有子路径的缓存
+
+        :return: 删除数量
+        """
+        directory = str(directory).rstrip("/")
+        with self._lock:
+            if not directory:
+                count = len(self.dir_to_id)
+                self.clear()
+                return count
+            # "/" 后一个字符为 "0"，path/ 到 path0 之间即为全部子路径
+            sorted_dirs = self._sorted_dirs
+            start = bisect_left(sorted_dirs, directory + "/")
+            end = bisect_left(sorted_dirs, directory + "0", start)
+            paths = sorted_dirs[start:end]
+            del sorted_dirs[start:end]
+            for path in paths:
+                self.id_to_dir.pop(self.dir_to_id.pop(path), None)
+            if directory in self.dir_to_id:
+                self.id_to_dir.pop(self.dir_to_id[directory], None)
+                self.__del_dir(directory)
+                paths.append(directory)
+        return len(paths)
+
+    def preload(self) -> int:
+        """
+        从数据库批量载入文件夹缓存，最多载入 maxsize 条
+
+        :return: 载入数量
+        """
+        count = 0
+        for id, directory in self._databasehelper.iter_folders():
+            if count >= self.maxsize:
+                break
+            with self._lock:
+                if id not in self.id_to_dir:
+                    self.__put(id, directory)
+            count += 1
+        logger.info(f"【路径缓存】从数据库载入 {count} 个文件夹路径")
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        """
+        缓存统计
+        """
+        with self._lock:
+            return {
+                "size": len(self.id_to_dir),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        """
+        清空所有缓存
+        """
+        with self._lock:
+            self.id_to_dir.clear()
+            self.dir_to_id.clear()
+            self._sorted_dirs.clear()
+
+
+class DownloadUrlCache:
+    """
+    115 下载链接缓存
+
+    按 (pickcode+获取方式 或 分享码+提取码+文件ID, User-Agent, app) 缓存，
+    有效期取自链接中的过期时间参数 t，并提前失效
+    """
+
+    # 提前失效时间（秒）
+    EXPIRE_MARGIN = 60
+    # 链接中不存在过期时间时的有效期（秒）
+    DEFAULT_TTL = 120
+    # 最长有效期（秒）
+    MAX_TTL = 2 * 60 * 60
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        :param maxsize: 最大缓存链接数
+        """
+        self.maxsize = max(int(maxsize or 0), 1)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cache = TLRUCache(
+            maxsize=self.maxsize, ttu=lambda _key, value, now: now + value[1]
+        )
+
+    @staticmethod
+    def make_key(
+        pickcode: str = "",
+        share_code: str = "",
+        receive_code: str = "",
+        file_id: Any = "",
+        user_agent: Any = "",
+        app: str = "",
+        mode: str = "",
+    ) -> Tuple:
+        """
+        生成缓存键
+
+        :param mode: 下载链接获取方式 cookie 或 open，切换后不使用旧方式获取的链接
+        """
+        if isinstance(user_agent, bytes):
+            user_agent = user_agent.decode("utf-8", "ignore")
+        user_agent = str(user_agent or "").strip()
+        if share_code:
+            return (
+                "share",
+                share_code,
+                receive_code or "",
+                str(file_id),
+                user_agent,
+                app or "",
+            )
+        return "pickcode", pickcode.lower(), user_agent, app or "", mode or ""
+
+    @classmethod
+    def ttl_of(cls, url: str) -> int:
+        """
+        根据链接中的过期时间计算有效期
+        """
+        try:
+            expire = int(parse_qs(urlsplit(url).query)["t"][0])
+        except (KeyError, IndexError, ValueError):
+            return cls.DEFAULT_TTL
+        return min(expire - int(time.time()) - cls.EXPIRE_MARGIN, cls.MAX_TTL)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        """
+        获取缓存链接
+        """
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value[0]
+
+    def set(self, key: Tuple, url: Any):
+        """
+        写入缓存链接，已过期或即将过期的链接不缓存
+        """
+        ttl = self.ttl_of(url)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (url, ttl)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        缓存统计
+        """
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
 
     def clear(self):
         """
         清空所有缓存
         """
-        self.id_to_dir.clear()
-        self.dir_to_id.clear()
+        with self._lock:
+            self._cache.clear()
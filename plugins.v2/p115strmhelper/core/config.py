@@ -50,10 +50,12 @@ class BaseConfig(BaseModel):
     # 刷新媒体服务器开关
     transfer_monitor_media_server_refresh_enabled: bool = False
 
-    # 全量同步覆盖模式
+    # 全量同步覆盖模式 always 总是 never 从不 changed 仅内容变化时
     full_sync_overwrite_mode: str = "never"
     # 清理无效 STRM 文件
     full_sync_remove_unless_strm: bool = False
+    # 全量同步数据先写入暂存表，完成后整体替换
+    full_sync_db_staging_enabled: bool = False
     # 定期全量同步开关
     timing_full_sync_strm: bool = False
     # 下载媒体信息文件开关
@@ -72,6 +74,10 @@ class BaseConfig(BaseModel):
     increment_sync_scrape_metadata_exclude_paths: Optional[str] = None
     increment_sync_media_server_refresh_enabled: bool = False
     increment_sync_mediaservers: Optional[List[str]] = None
+    # 增量同步目录树快照，仅重新导出有变化的子目录
+    increment_sync_snapshot_enabled: bool = False
+    # 目录树快照过期时间（小时）
+    increment_sync_snapshot_ttl: int = 24
 
     monitor_life_enabled: bool = False
     monitor_life_auto_download_mediainfo_enabled: bool = False
@@ -105,6 +111,31 @@ class BaseConfig(BaseModel):
     directory_upload_copyext: str = "srt,ssa,ass"
     directory_upload_path: Optional[List[Dict]] = None
 
+    # 目录树对比模式 memory: 内存集合 external: 外部排序归并
+    sync_tree_diff_mode: str = "memory"
+    # 使用本地文件索引代替扫描本地媒体库
+    local_index_enabled: bool = False
+    # 本地文件索引校验周期
+    local_index_verify_cron: Optional[str] = None
+    # 数据库性能配置 default: SQLite 默认 balanced: WAL 均衡 performance: WAL 高性能
+    db_profile: str = "default"
+    # STRM 文件写入线程数，为 0 时同步写入
+    strm_writer_workers: int = 4
+    # STRM 文件先写入临时文件再重命名
+    strm_writer_atomic: bool = False
+    # 302 跳转下载地址缓存数量
+    redirect_url_cache_size: int = 1024
+    # 文件夹路径ID内存缓存条目数
+    id_path_cache_size: int = 100_000
+    # 事件类数据库写入进入后台队列合并提交
+    db_write_queue_enabled: bool = False
+    # 数据库 extra 字段存储模式 full: 完整数据 compact: 仅保留指定字段 none: 不存储
+    db_extra_mode: str = "full"
+    # compact 模式下 extra 字段保留的数据，包含整理后字段名与115原始字段名
+    db_extra_fields: str = "ico,thumb,u,play_long,star,m,labels,fl"
+    # 按当前存储模式重新编码已有 extra 数据并回收数据库空间，执行后自动关闭
+    db_extra_reencode: bool = False
+
 
 class ConfigManager:
     """
@@ -0,0 +1,209 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import mkstemp
+from typing import Callable, Dict, Optional
+
+
+def _current_umask() -> int:
+    """
+    获取当前进程 umask
+    """
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# 模块载入时读取一次，避免写入时修改 umask 影响其它线程
+_UMASK = _current_umask()
+
+
+class StrmWriter:
+    """
+    STRM 文件写入器
+
+    缓存已创建的目录避免逐文件 mkdir，可使用线程池异步写入，支持临时文件原子替换
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 0,
+        atomic: bool = False,
+        max_pending: int = 1000,
+        max_dirs: int = 10_000,
+    ):
+        """
+        :param max_workers: 写入线程数，为 0 时同步写入
+        :param atomic: 是否先写入临时文件再重命名
+        :param max_pending: 异步写入最大排队数量
+        :param max_dirs: 已创建目录缓存最大数量，超出后清空重新缓存
+        """
+        self.max_workers = int(max_workers or 0)
+        self.atomic = bool(atomic)
+        self.max_dirs = max(int(max_dirs or 0), 1)
+        self.written_count = 0
+        self.fail_count = 0
+        self.mkdir_count = 0
+        self.fail_dict: Dict[str, str] = {}
+        self._dirs = set()
+        self._lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = threading.BoundedSemaphore(max(int(max_pending or 0), 1))
+        self._futures = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def ensure_dir(self, directory: Path):
+        """
+        创建目录，已创建过的目录直接跳过
+        """
+        if directory in self._dirs:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if len(self._dirs) >= self.max_dirs:
+                # 长期使用的写入器避免缓存无限增长
+                self._dirs.clear()
+            self._dirs.add(directory)
+            self.mkdir_count += 1
+
+    def __write_file(self, file_path: Path, content: str):
+        """
+        写入文件
+        """
+        if not self.atomic:
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write(content)
+            return
+        fd, temp_path = mkstemp(
+            dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(content)
+                # mkstemp 创建的文件权限为 0600，保持原文件权限或按 umask 设置普通文件权限
+                try:
+                    mode = os.stat(file_path).st_mode & 0o7777
+                except FileNotFoundError:
+                    mode = 0o666 & ~_UMASK
+                os.fchmod(file.fileno(), mode)
+            os.replace(temp_path, file_path)
+        except Exception:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def __write(self, file_path: Path, content: str):
+        """
+        写入 STRM 文件，目录被外部删除时清理缓存后重试一次
+        """
+        self.ensure_dir(file_path.parent)
+        try:
+            self.__write_file(file_path, content)
+        except FileNotFoundError:
+            with self._lock:
+                self._dirs.discard(file_path.parent)
+            self.ensure_dir(file_path.parent)
+            self.__write_file(file_path, content)
+
+    def __run(
+        self,
+        file_path: Path,
+        content: str,
+        callback: Optional[Callable[[Path, Optional[Exception]], None]],
+    ) -> Optional[Exception]:
+        """
+        执行写入并更新计数
+        """
+        error = None
+        try:
+            self.__write(file_path, content)
+        except Exception as e:
+            error = e
+        with self._lock:
+            if error:
+                self.fail_count += 1
+                self.fail_dict[str(file_path)] = str(error)
+            else:
+                self.written_count += 1
+            if callback:
+                callback(file_path, error)
+        return error
+
+    def write(self, file_path: Path, content: str):
+        """
+        同步写入 STRM 文件，失败时抛出异常
+        """
+        file_path = Path(file_path)
+        error = self.__run(file_path, content, None)
+        if error:
+            raise error
+
+    def submit(
+        self,
+        file_path: Path,
+        content: str,
+        callback: Optional[Callable[[Path, Optional[Exception]], None]] = None,
+    ):
+        """
+        提交写入任务，未开启线程池时同步写入
+
+        :param callback: 写入完成回调 (文件路径, 异常)，回调之间互斥执行
+        """
+        file_path = Path(file_path)
+        if self.max_workers <= 0:
+            self.__run(file_path, content, callback)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="StrmWriter"
+            )
+        self._pending.acquire()
+        future = self._executor.submit(self.__run, file_path, content, callback)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self.__done)
+
+    def __done(self, future):
+        """
+        异步任务完成
+        """
+        with self._lock:
+            self._futures.discard(future)
+        self._pending.release()
+
+    def wait(self):
+        """
+        等待所有已提交的写入任务完成
+        """
+        while True:
+            with self._lock:
+                futures = list(self._futures)
+            if not futures:
+                return
+            for future in futures:
+                future.result()
+
+    def close(self):
+        """
+        等待写入完成并关闭线程池
+        """
+        self.wait()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        写入统计
+        """
+        return {
+            "written": self.written_count,
+            "failed": self.fail_count,
+            "mkdir": self.mkdir_count,
+            "dirs_cached": len(self._dirs),
+        }
@@ -0,0 +1,42 @@
+"""1.0.1
+
+Revision ID: 5f8a1c3b9d27
+Revises: 294b0079357e
+Create Date: 2026-10-17 10:12:31.508214
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5f8a1c3b9d27'
+down_revision = '294b0079357e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    files / folders 表创建路径唯一索引与 parent_id 索引
+    """
+    for table in ("files", "folders"):
+        # 清理路径重复的数据，每个路径只保留一条
+        op.execute(
+            f"DELETE FROM {table} WHERE path IS NOT NULL AND rowid NOT IN "
+            f"(SELECT MAX(rowid) FROM {table} WHERE path IS NOT NULL GROUP BY path)"
+        )
+        op.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{table}_path ON {table} (path)"
+        )
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_parent_id ON {table} (parent_id)"
+        )
+    op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """
+    回滚
+    """
+    for table in ("files", "folders"):
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_path")
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_parent_id")
@@ -1,7 +1,23 @@
+from ast import literal_eval
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import batched
 from pathlib import Path
-from typing import Any, Generator, Self, List
-
-from sqlalchemy import create_engine, and_, inspect
+from typing import Any, Dict, Generator, Self, List, Optional, Tuple, Iterable
+
+from orjson import dumps, loads, OPT_NON_STR_KEYS
+from sqlalchemy import (
+    create_engine,
+    event,
+    and_,
+    or_,
+    inspect,
+    select,
+    text,
+    true,
+    Row,
+)
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import (
     as_declarative,
     declared_attr,
@@ -19,36 +35,141 @@ class __DBManager:
     数据库管理器，
     """
 
+    # 数据库性能配置，default 为 SQLite 默认配置
+    PROFILES: Dict[str, Dict[str, Any]] = {
+        "default": {},
+        "balanced": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -16_000,
+            "mmap_size": 64 * 1024 * 1024,
+            "temp_store": "MEMORY",
+        },
+        "performance": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -64_000,
+            "mmap_size": 256 * 1024 * 1024,
+            "temp_store": "MEMORY",
+        },
+    }
+    # 读连接池大小
+    READ_POOL_SIZE = 4
+
     # 数据库引擎
     Engine = None
     # 会话工厂
     SessionFactory = None
     # 多线程全局使用的数据库会话
     ScopedSession = None
+    # 只读数据库引擎
+    ReadEngine = None
+    # 只读会话工厂
+    ReadSessionFactory = None
+    # 多线程全局使用的只读数据库会话
+    ReadScopedSession = None
+    # 当前性能配置
+    profile = None
+
+    @staticmethod
+    def __set_pragmas(engine, pragmas: Dict[str, Any], query_only: bool = False):
+        """
+        连接建立时设置 PRAGMA
+        """
+
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            for key, value in pragmas.items():
+                cursor.execute(f"PRAGMA {key}={value}")
+            if query_only:
+                cursor.execute("PRAGMA query_only=ON")
+            cursor.close()
 
-    def init_database(self, db_path: Path):
+    def init_database(self, db_path: Path, profile: str = "default"):
         """
         初始化数据库引擎
+
+        非默认配置下使用单连接写引擎串行写入，读操作使用独立的只读连接池
         """
+        pragmas = self.PROFILES.get(profile)
+        if pragmas is None:
+            profile, pragmas = "default", {}
         db_kwargs = {
             "url": f"sqlite:///{db_path}",
             "pool_pre_ping": settings.DB_POOL_PRE_PING,
             "echo": settings.DB_ECHO,
             "pool_recycle": settings.DB_POOL_RECYCLE,
         }
-        self.Engine = create_engine(**db_kwargs)
+        if not pragmas:
+            self.Engine = create_engine(**db_kwargs)
+            self.ReadEngine = self.Engine
+        else:
+            connect_args = {"check_same_thread": False, "timeout": 30}
+            self.Engine = create_engine(
+                **db_kwargs,
+                poolclass=QueuePool,
+                pool_size=1,
+                max_overflow=0,
+                pool_timeout=300,
+                connect_args=connect_args,
+            )
+            self.__set_pragmas(self.Engine, pragmas)
+            self.ReadEngine = create_engine(
+                **db_kwargs,
+                poolclass=QueuePool,
+                pool_size=self.READ_POOL_SIZE,
+                max_overflow=self.READ_POOL_SIZE,
+                connect_args=connect_args,
+            )
+            self.__set_pragmas(
+                self.ReadEngine,
+                {k: v for k, v in pragmas.items() if k != "journal_mode"},
+                query_only=True,
+            )
         self.SessionFactory = sessionmaker(bind=self.Engine)
         self.ScopedSession = scoped_session(self.SessionFactory)
+        self.ReadSessionFactory = sessionmaker(bind=self.ReadEngine)
+        self.ReadScopedSession = scoped_session(self.ReadSessionFactory)
+        self.profile = profile
 
     def close_database(self):
         """
         关闭所有数据库连接并清理资源
         """
+        if self.ReadEngine and self.ReadEngine is not self.Engine:
+            self.ReadEngine.dispose()
         if self.Engine:
             self.Engine.dispose()
         self.Engine = None
         self.SessionFactory = None
         self.ScopedSession = None
+        self.ReadEngine = None
+        self.ReadSessionFactory = None
+        self.ReadScopedSession = None
+        self.profile = None
+
+    def checkpoint(self):
+        """
+        执行 WAL 检查点，将 WAL 文件内容写回数据库并截断
+        """
+        if not self.Engine or not self.PROFILES.get(self.profile):
+            return None
+        with self.Engine.connect() as connection:
+            return connection.execute(
+                text("PRAGMA wal_checkpoint(TRUNCATE)")
+            ).fetchone()
+
+    def vacuum(self):
+        """
+        回收数据库空间
+        """
+        if not self.Engine:
+            return
+        with self.Engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+                text("VACUUM")
+            )
 
     def is_initialized(self) -> bool:
         """
@@ -77,6 +198,26 @@ def get_db() -> Generator:
             db.close()
 
 
+@contextmanager
+def db_transaction() -> Generator[Session, None, None]:
+    """
+    在同一会话与事务中执行多个数据库更新操作，全部成功后统一提交，任一失败则整体回滚
+
+    事务期间当前线程的 db_update 操作不再单独提交
+    """
+    db = ct_db_manager.ScopedSession()
+    db.info["transaction"] = True
+    try:
+        yield db
+        db.commit()
+    except Exception as err:
+        db.rollback()
+        raise err
+    finally:
+        db.info.pop("transaction", None)
+        db.close()
+
+
 def db_update(func):
     """
     数据库更新类操作装饰器，第一个参数必须是数据库会话或存在db参数
@@ -94,6 +235,9 @@ def db_update(func):
             _close_db = True
             # 更新参数中的数据库会话
             args, kwargs = update_args_db(args, kwargs, db)
+        if db.info.get("transaction"):
+            # 处于 db_transaction 事务中，由事务统一提交
+            return func(*args, **kwargs)
         try:
             # 执行函数
             result = func(*args, **kwargs)
@@ -124,8 +268,8 @@ def db_query(func):
         # 从参数中获取数据库会话
         db = get_args_db(args, kwargs)
         if not db:
-            # 如果没有获取到数据库会话，创建一个
-            db = ct_db_manager.ScopedSession()
+            # 如果没有获取到数据库会话，创建一个只读会话
+            db = ct_db_manager.ReadScopedSession()
             # 标记需要关闭数据库会话
             _close_db = True
             # 更新参数中的数据库会话
@@ -144,6 +288,88 @@ def db_query(func):
     return wrapper
 
 
+def path_startswith(column, prefix: str):
+    """
+    路径前缀匹配条件
+
+    使用范围比较代替 LIKE，可以命中路径索引
+    """
+    if not prefix:
+        return true()
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def unique_rows(rows: List[Dict], *keys: str) -> List[Dict]:
+    """
+    按多个字段去重，任一字段重复时保留最后出现的数据
+    """
+    seen = {key: set() for key in keys}
+    result = []
+    for row in reversed(rows):
+        if any(row[key] in seen[key] for key in keys):
+            continue
+        for key in keys:
+            seen[key].add(row[key])
+        result.append(row)
+    result.reverse()
+    return result
+
+
+def path_subtree(column, path: str):
+    """
+    路径及其所有子路径匹配条件
+
+    "/" 后一个字符为 "0"，path/ 到 path0 之间即为全部子路径，可以命中路径索引
+    """
+    path = path.rstrip("/")
+    if not path:
+        return true()
+    return or_(column == path, and_(column >= path + "/", column < path + "0"))
+
+
+@lru_cache(maxsize=8)
+def __extra_fields(fields: str) -> Tuple[str, ...]:
+    """
+    解析保留字段配置
+    """
+    return tuple(f.strip() for f in fields.split(",") if f.strip())
+
+
+def encode_extra(
+    item: Optional[Dict], mode: str = "compact", fields: str = ""
+) -> Optional[str]:
+    """
+    编码 extra 字段
+
+    :param mode: full 完整数据 compact 仅保留指定字段 none 不存储
+    :param fields: compact 模式下保留的字段，逗号分隔
+    """
+    if not item or mode == "none":
+        return None
+    if mode == "compact":
+        item = {k: item[k] for k in __extra_fields(fields or "") if k in item}
+        if not item:
+            return None
+    return dumps(item, default=str, option=OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def decode_extra(extra: Optional[str]) -> Optional[Dict]:
+    """
+    解析 extra 字段，兼容旧版 Python repr 与 JSON
+    """
+    if not extra:
+        return None
+    try:
+        return loads(extra)
+    except Exception:
+        pass
+    try:
+        return literal_eval(extra)
+    except Exception:
+        return None
+
+
 @as_declarative()
 class P115StrmHelperBase:
     id: Any
@@ -182,6 +408,46 @@ class P115StrmHelperBase:
         result = db.query(cls).all()
         return list(result)
 
+    @classmethod
+    def __select(cls, columns: Optional[Iterable[str]] = None):
+        """
+        生成 Core 查询，不构建 ORM 实例，忽略表中不存在的字段
+        """
+        table_columns = cls.__table__.columns  # noqa
+        if columns:
+            return select(*(table_columns[c] for c in columns if c in table_columns))
+        return select(*table_columns)
+
+    @classmethod
+    @db_query
+    def get_row_by(
+        cls, db: Session, key: str, value: Any, columns: Optional[List[str]] = None
+    ) -> Optional[Row]:
+        """
+        通过字段获取单行数据
+        """
+        return db.execute(
+            cls.__select(columns).where(getattr(cls, key) == value).limit(1)
+        ).first()
+
+    @classmethod
+    @db_query
+    def get_rows_by(
+        cls,
+        db: Session,
+        key: str,
+        values: Iterable[Any],
+        columns: Optional[List[str]] = None,
+    ) -> List[Row]:
+        """
+        通过字段批量获取数据，每批最多 500 个值
+        """
+        column = getattr(cls, key)
+        rows = []
+        for chunk in batched(values, 500):
+            rows.extend(db.execute(cls.__select(columns).where(column.in_(chunk))))
+        return rows
+
     def to_dict(self):
         return {c.name: getattr(self, c.name, None) for c in self.__table__.columns}  # noqa
 
@@ -1,2 +1,5 @@
 from .file import File
 from .folder import Folder
+from .snapshot import SnapshotFolder, SnapshotFile
+from .local_file import LocalFile, LocalIndexDir
+from .staging import FileStaging, FolderStaging
@@ -1,9 +1,28 @@
+from itertools import batched
 from typing import Dict, List
 
-from sqlalchemy import Column, Integer, String, Text, BigInteger, select, delete
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Text,
+    BigInteger,
+    select,
+    delete,
+    update,
+    func,
+)
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
-from ...db_manager import db_update, db_query, P115StrmHelperBase
+from ...db_manager import (
+    db_update,
+    db_query,
+    path_startswith,
+    path_subtree,
+    unique_rows,
+    P115StrmHelperBase,
+)
 
 
 class File(P115StrmHelperBase):
@@ -14,14 +33,14 @@ class File(P115StrmHelperBase):
     __tablename__ = "files"
 
     id = Column(Integer, primary_key=True)
-    parent_id = Column(Integer, nullable=False)
+    parent_id = Column(Integer, nullable=False, index=True)
     name = Column(String(255), default="")
     sha1 = Column(String(40), default="")
     size = Column(BigInteger, default=0)
     pickcode = Column(String(50), default="")
     ctime = Column(BigInteger, default=0)
     mtime = Column(BigInteger, default=0)
-    path = Column(Text, default="")
+    path = Column(Text, default="", index=True, unique=True)
     extra = Column(Text)
 
     @staticmethod
@@ -42,6 +61,54 @@ class File(P115StrmHelperBase):
         """
         return db.scalars(select(File).where(File.id == file_id)).first()
 
+    @staticmethod
+    @db_query
+    def get_page_by_path_prefix(
+        db: Session, prefix: str, after_id: int = 0, limit: int = 10_000
+    ):
+        """
+        按 ID 顺序分页获取路径前缀下的文件 (id, path, pickcode)
+        """
+        return db.execute(
+            select(File.id, File.path, File.pickcode)
+            .where(path_startswith(File.path, prefix), File.id > after_id)
+            .order_by(File.id)
+            .limit(limit)
+        ).all()
+
+    @staticmethod
+    @db_query
+    def get_pickcodes_by_paths(db: Session, file_paths: List[str]):
+        """
+        通过路径批量获取 (id, path, pickcode)
+        """
+        return db.execute(
+            select(File.id, File.path, File.pickcode).where(File.path.in_(file_paths))
+        ).all()
+
+    @staticmethod
+    @db_query
+    def get_extra_page(db: Session, after_id: int = -1, limit: int = 5000):
+        """
+        按 ID 顺序分页获取 (id, extra)
+        """
+        return db.execute(
+            select(File.id, File.extra)
+            .where(File.id > after_id)
+            .order_by(File.id)
+            .limit(limit)
+        ).all()
+
+    @staticmethod
+    @db_update
+    def update_extra_batch(db: Session, rows: List[Dict]):
+        """
+        批量更新 extra 字段
+        """
+        if rows:
+            db.execute(update(File), rows)
+        return True
+
     @staticmethod
     @db_query
     def get_by_parent_id(db: Session, parent_id: int):
@@ -77,13 +144,27 @@ class File(P115StrmHelperBase):
         批量写入或更新数据
 
         逻辑：
-          - 先判断需要写入的数据路径是否存在，存在则先删除记录
-          - 写入数据
-        """
-        for entry in batch:
-            if entry["table"] == "files":
-                db.execute(delete(File).where(File.path == entry["data"]["path"]))
-                db.merge(File(**entry["data"]))
+          - 批次内按 ID 与路径去重，保留最后出现的数据
+          - 批量删除路径相同的记录
+          - 批量写入，ID 冲突时更新
+        """
+        rows = unique_rows(
+            [entry["data"] for entry in batch if entry["table"] == "files"],
+            "id",
+            "path",
+        )
+        if not rows:
+            return True
+        for paths in batched([row["path"] for row in rows], 500):
+            db.execute(delete(File).where(File.path.in_(paths)))
+        stmt = insert(File)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[File.id],
+                set_={key: stmt.excluded[key] for key in rows[0] if key != "id"},
+            ),
+            rows,
+        )
         return True
 
     @staticmethod
@@ -92,11 +173,42 @@ class File(P115StrmHelperBase):
         """
         通过路径批量删除
         """
-        db.query(File).filter(File.path.startswith(path)).delete(
+        db.query(File).filter(path_subtree(File.path, path)).delete(
             synchronize_session=False
         )
         return True
 
+    @staticmethod
+    @db_update
+    def move_subtree(db: Session, old_path: str, new_path: str):
+        """
+        移动或重命名路径，同时更新所有子路径
+
+        逻辑：
+          - 先删除目标路径及其子路径下的记录
+          - 替换原路径前缀为目标路径
+        """
+        old_path, new_path = old_path.rstrip("/"), new_path.rstrip("/")
+        if not old_path or not new_path or old_path == new_path:
+            return True
+        db.execute(
+            delete(File).where(path_subtree(File.path, new_path)),
+            execution_options={"synchronize_session": False},
+        )
+        db.execute(
+            update(File)
+            .where(path_subtree(File.path, old_path))
+            .values(path=new_path + func.substr(File.path, len(old_path) + 1)),
+            execution_options={"synchronize_session": False},
+        )
+        db.execute(
+            update(File)
+            .where(File.path == new_path)
+            .values(name=new_path.rsplit("/", 1)[-1]),
+            execution_options={"synchronize_session": False},
+        )
+        return True
+
     @staticmethod
     @db_update
     def update_path(db: Session, file_id: int, new_path: str):
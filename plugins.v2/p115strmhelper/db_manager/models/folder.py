@@ -1,9 +1,18 @@
+from itertools import batched
 from typing import Dict, List
 
-from sqlalchemy import Column, Integer, String, Text, select, delete
+from sqlalchemy import Column, Integer, String, Text, select, delete, update, func
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
-from ...db_manager import db_update, db_query, P115StrmHelperBase
+from ...db_manager import (
+    db_update,
+    db_query,
+    path_startswith,
+    path_subtree,
+    unique_rows,
+    P115StrmHelperBase,
+)
 
 
 class Folder(P115StrmHelperBase):
@@ -14,9 +23,9 @@ class Folder(P115StrmHelperBase):
     __tablename__ = "folders"
 
     id = Column(Integer, primary_key=True)
-    parent_id = Column(Integer, nullable=False)
+    parent_id = Column(Integer, nullable=False, index=True)
     name = Column(String(255), nullable=False)
-    path = Column(Text, nullable=False)
+    path = Column(Text, nullable=False, index=True, unique=True)
 
     @staticmethod
     @db_query
@@ -36,6 +45,19 @@ class Folder(P115StrmHelperBase):
         """
         return db.scalars(select(Folder).where(Folder.id == file_id)).first()
 
+    @staticmethod
+    @db_query
+    def get_page(db: Session, after_id: int = -1, limit: int = 10_000):
+        """
+        按 ID 顺序分页获取文件夹 (id, path)
+        """
+        return db.execute(
+            select(Folder.id, Folder.path)
+            .where(Folder.id > after_id)
+            .order_by(Folder.id)
+            .limit(limit)
+        ).all()
+
     @staticmethod
     @db_query
     def get_by_parent_id(db: Session, parent_id: int):
@@ -73,13 +95,27 @@ class Folder(P115StrmHelperBase):
         批量写入或更新数据
 
         逻辑：
-          - 先判断需要写入的数据路径是否存在，存在则先删除记录
-          - 写入数据
+          - 批次内按 ID 与路径去重，保留最后出现的数据
+          - 批量删除路径相同的记录
+          - 批量写入，ID 冲突时更新
         """
-        for entry in batch:
-            if entry["table"] == "folders":
-                db.execute(delete(Folder).where(Folder.path == entry["data"]["path"]))
-                db.merge(Folder(**entry["data"]))
+        rows = unique_rows(
+            [entry["data"] for entry in batch if entry["table"] == "folders"],
+            "id",
+            "path",
+        )
+        if not rows:
+            return True
+        for paths in batched([row["path"] for row in rows], 500):
+            db.execute(delete(Folder).where(Folder.path.in_(paths)))
+        stmt = insert(Folder)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Folder.id],
+                set_={key: stmt.excluded[key] for key in rows[0] if key != "id"},
+            ),
+            rows,
+        )
         return True
 
     @staticmethod
@@ -88,7 +124,38 @@ class Folder(P115StrmHelperBase):
         """
         通过路径批量删除
         """
-        db.query(Folder).filter(Folder.path.startswith(path)).delete(
+        db.query(Folder).filter(path_subtree(Folder.path, path)).delete(
             synchronize_session=False
         )
         return True
+
+    @staticmethod
+    @db_update
+    def move_subtree(db: Session, old_path: str, new_path: str):
+        """
+        移动或重命名路径，同时更新所有子路径
+
+        逻辑：
+          - 先删除目标路径及其子路径下的记录
+          - 替换原路径前缀为目标路径
+        """
+        old_path, new_path = old_path.rstrip("/"), new_path.rstrip("/")
+        if not old_path or not new_path or old_path == new_path:
+            return True
+        db.execute(
+            delete(Folder).where(path_subtree(Folder.path, new_path)),
+            execution_options={"synchronize_session": False},
+        )
+        db.execute(
+            update(Folder)
+            .where(path_subtree(Folder.path, old_path))
+            .values(path=new_path + func.substr(Folder.path, len(old_path) + 1)),
+            execution_options={"synchronize_session": False},
+        )
+        db.execute(
+            update(Folder)
+            .where(Folder.path == new_path)
+            .values(name=new_path.rsplit("/", 1)[-1]),
+            execution_options={"synchronize_session": False},
+        )
+        return True
@@ -0,0 +1,231 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import (
+    Column,
+    Text,
+    String,
+    BigInteger,
+    select,
+    delete,
+    update,
+    func,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from ...db_manager import (
+    db_update,
+    db_query,
+    path_startswith,
+    path_subtree,
+    P115StrmHelperBase,
+)
+
+
+class LocalFile(P115StrmHelperBase):
+    """
+    本地生成文件索引类
+    """
+
+    __tablename__ = "local_files"
+
+    # 本地路径
+    local_path = Column(Text, primary_key=True)
+    # 网盘路径
+    pan_path = Column(Text, default="")
+    pickcode = Column(String(50), default="")
+    # 写入时间
+    mtime = Column(BigInteger, default=0)
+
+    @staticmethod
+    @db_query
+    def get_by_local_path(db: Session, local_path: str):
+        """
+        通过本地路径获取
+        """
+        return db.scalars(
+            select(LocalFile).where(LocalFile.local_path == local_path)
+        ).first()
+
+    @staticmethod
+    @db_query
+    def get_paths_by_prefix(db: Session, prefix: str) -> List[str]:
+        """
+        获取目录下所有本地路径
+        """
+        return list(
+            db.execute(
+                select(LocalFile.local_path).where(
+                    path_startswith(LocalFile.local_path, prefix)
+                )
+            ).scalars()
+        )
+
+    @staticmethod
+    @db_update
+    def upsert_batch(db: Session, batch: List[Dict]):
+        """
+        批量写入或更新数据
+        """
+        if not batch:
+            return True
+        stmt = insert(LocalFile)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[LocalFile.local_path],
+                set_={
+                    "pan_path": stmt.excluded.pan_path,
+                    "pickcode": stmt.excluded.pickcode,
+                    "mtime": stmt.excluded.mtime,
+                },
+            ),
+            batch,
+        )
+        return True
+
+    @staticmethod
+    @db_update
+    def insert_ignore_batch(db: Session, batch: List[Dict]):
+        """
+        批量写入数据，已存在的记录保持不变
+        """
+        if not batch:
+            return True
+        db.execute(insert(LocalFile).on_conflict_do_nothing(), batch)
+        return True
+
+    @staticmethod
+    @db_update
+    def remove_batch(db: Session, local_paths: List[str]):
+        """
+        批量删除
+        """
+        if not local_paths:
+            return True
+        db.execute(delete(LocalFile).where(LocalFile.local_path.in_(local_paths)))
+        return True
+
+    @staticmethod
+    @db_update
+    def remove_by_prefix(db: Session, prefix: str):
+        """
+        删除目录下所有索引
+        """
+        db.execute(
+            delete(LocalFile).where(path_startswith(LocalFile.local_path, prefix))
+        )
+        return True
+
+    @staticmethod
+    @db_update
+    def update_local_path(db: Session, old_path: str, new_path: str):
+        """
+        更新本地路径
+
+        逻辑：
+          - 先判断修改后路径是否存在，存在则先删除记录
+          - 匹配原路径，修改路径
+        """
+        db.execute(delete(LocalFile).where(LocalFile.local_path == new_path))
+        db.execute(
+            update(LocalFile)
+            .where(LocalFile.local_path == old_path)
+            .values(local_path=new_path)
+        )
+        return True
+
+    @staticmethod
+    @db_update
+    def move_local_subtree(db: Session, old_path: str, new_path: str):
+        """
+        移动本地目录，同时更新所有子路径
+
+        逻辑：
+          - 先删除目标目录下的记录
+          - 替换原目录前缀为目标目录
+        """
+        old_path, new_path = old_path.rstrip("/"), new_path.rstrip("/")
+        if not old_path or not new_path or old_path == new_path:
+            return True
+        db.execute(
+            delete(LocalFile).where(path_subtree(LocalFile.local_path, new_path)),
+            execution_options={"synchronize_session": False},
+        )
+        db.execute(
+            update(LocalFile)
+            .where(path_subtree(LocalFile.local_path, old_path))
+            .values(
+                local_path=new_path
+                + func.substr(LocalFile.local_path, len(old_path) + 1)
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        return True
+
+    @staticmethod
+    @db_update
+    def move_pan_subtree(db: Session, old_path: str, new_path: str):
+        """
+        网盘路径移动或重命名，同时更新所有子路径对应的网盘路径
+        """
+        old_path, new_path = old_path.rstrip("/"), new_path.rstrip("/")
+        if not old_path or not new_path or old_path == new_path:
+            return True
+        db.execute(
+            update(LocalFile)
+            .where(path_subtree(LocalFile.pan_path, old_path))
+            .values(
+                pan_path=new_path + func.substr(LocalFile.pan_path, len(old_path) + 1)
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        return True
+
+
+class LocalIndexDir(P115StrmHelperBase):
+    """
+    本地文件索引初始化记录类
+
+    目录完成一次完整扫描并写入索引后记录，之后可直接使用索引代替扫描
+    """
+
+    __tablename__ = "local_index_dirs"
+
+    # 本地目录
+    local_dir = Column(Text, primary_key=True)
+    # 扫描时包含的文件后缀名，逗号分隔
+    extensions = Column(Text, default="")
+    # 初始化时间
+    seeded_at = Column(BigInteger, default=0)
+
+    @staticmethod
+    @db_query
+    def get_extensions(db: Session, local_dir: str) -> Optional[str]:
+        """
+        获取目录初始化时包含的文件后缀名，未初始化返回 None
+        """
+        return db.execute(
+            select(LocalIndexDir.extensions).where(
+                LocalIndexDir.local_dir == local_dir
+            )
+        ).scalar()
+
+    @staticmethod
+    @db_update
+    def replace(db: Session, local_dir: str, extensions: str, seeded_at: int):
+        """
+        写入或更新初始化记录
+        """
+        stmt = insert(LocalIndexDir).values(
+            local_dir=local_dir, extensions=extensions, seeded_at=seeded_at
+        )
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[LocalIndexDir.local_dir],
+                set_={
+                    "extensions": stmt.excluded.extensions,
+                    "seeded_at": stmt.excluded.seeded_at,
+                },
+            )
+        )
+        return True
@@ -0,0 +1,169 @@
+from typing import Dict, List, Tuple
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    Text,
+    BigInteger,
+    Index,
+    select,
+    delete,
+    insert,
+)
+from sqlalchemy.orm import Session
+
+from ...db_manager import db_update, db_query, P115StrmHelperBase
+
+
+class SnapshotFolder(P115StrmHelperBase):
+    """
+    网盘目录树快照子目录类
+    """
+
+    __tablename__ = "snapshot_folders"
+    __table_args__ = (
+        Index("ix_snapshot_folders_mapping_folder_id", "mapping", "folder_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # 同步映射 本地目录#网盘目录
+    mapping = Column(Text, nullable=False)
+    # 子目录 ID
+    folder_id = Column(Integer, nullable=False)
+    # 子目录修改时间
+    mtime = Column(BigInteger, default=0)
+    # 快照更新时间
+    updated_at = Column(BigInteger, default=0)
+
+    @staticmethod
+    @db_query
+    def get_by_mapping(db: Session, mapping: str) -> Dict[int, Tuple[int, int]]:
+        """
+        获取同步映射下所有子目录 {folder_id: (mtime, updated_at)}
+        """
+        rows = db.execute(
+            select(
+                SnapshotFolder.folder_id,
+                SnapshotFolder.mtime,
+                SnapshotFolder.updated_at,
+            ).where(SnapshotFolder.mapping == mapping)
+        ).all()
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    @staticmethod
+    @db_update
+    def replace(
+        db: Session, mapping: str, folder_id: int, mtime: int, updated_at: int
+    ):
+        """
+        写入或更新子目录快照
+        """
+        db.execute(
+            delete(SnapshotFolder).where(
+                SnapshotFolder.mapping == mapping,
+                SnapshotFolder.folder_id == folder_id,
+            )
+        )
+        db.execute(
+            insert(SnapshotFolder).values(
+                mapping=mapping,
+                folder_id=folder_id,
+                mtime=mtime,
+                updated_at=updated_at,
+            )
+        )
+        return True
+
+    @staticmethod
+    @db_update
+    def remove_batch(db: Session, mapping: str, folder_ids: List[int]):
+        """
+        批量删除子目录快照
+        """
+        db.execute(
+            delete(SnapshotFolder).where(
+                SnapshotFolder.mapping == mapping,
+                SnapshotFolder.folder_id.in_(folder_ids),
+            )
+        )
+        return True
+
+
+class SnapshotFile(P115StrmHelperBase):
+    """
+    网盘目录树快照文件类
+    """
+
+    __tablename__ = "snapshot_files"
+    __table_args__ = (
+        Index("ix_snapshot_files_mapping_folder_id", "mapping", "folder_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # 同步映射 本地目录#网盘目录
+    mapping = Column(Text, nullable=False)
+    # 所属子目录 ID
+    folder_id = Column(Integer, nullable=False)
+    # 网盘路径
+    pan_path = Column(Text, nullable=False)
+    # 本地路径
+    local_path = Column(Text, nullable=False)
+
+    @staticmethod
+    @db_query
+    def get_by_folder_id(
+        db: Session, mapping: str, folder_id: int
+    ) -> List[Tuple[str, str]]:
+        """
+        获取子目录下所有文件 [(本地路径, 网盘路径)]
+        """
+        rows = db.execute(
+            select(SnapshotFile.local_path, SnapshotFile.pan_path).where(
+                SnapshotFile.mapping == mapping,
+                SnapshotFile.folder_id == folder_id,
+            )
+        ).all()
+        return [(row[0], row[1]) for row in rows]
+
+    @staticmethod
+    @db_update
+    def replace(
+        db: Session, mapping: str, folder_id: int, paths: List[Tuple[str, str]]
+    ):
+        """
+        替换子目录下所有文件
+        """
+        db.execute(
+            delete(SnapshotFile).where(
+                SnapshotFile.mapping == mapping,
+                SnapshotFile.folder_id == folder_id,
+            )
+        )
+        if paths:
+            db.execute(
+                insert(SnapshotFile),
+                [
+                    {
+                        "mapping": mapping,
+                        "folder_id": folder_id,
+                        "local_path": local_path,
+                        "pan_path": pan_path,
+                    }
+                    for local_path, pan_path in paths
+                ],
+            )
+        return True
+
+    @staticmethod
+    @db_update
+    def remove_batch(db: Session, mapping: str, folder_ids: List[int]):
+        """
+        批量删除子目录下所有文件
+        """
+        db.execute(
+            delete(SnapshotFile).where(
+                SnapshotFile.mapping == mapping,
+                SnapshotFile.folder_id.in_(folder_ids),
+            )
+        )
+        return True
@@ -0,0 +1,98 @@
+from typing import Dict, List
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Text,
+    BigInteger,
+    select,
+    delete,
+    insert,
+)
+from sqlalchemy.orm import Session
+
+from ...db_manager import db_update, path_subtree, P115StrmHelperBase
+from .file import File
+from .folder import Folder
+
+
+class FileStaging(P115StrmHelperBase):
+    """
+    全量同步文件暂存类
+    """
+
+    __tablename__ = "files_staging"
+
+    id = Column(Integer, primary_key=True)
+    parent_id = Column(Integer, nullable=False)
+    name = Column(String(255), default="")
+    sha1 = Column(String(40), default="")
+    size = Column(BigInteger, default=0)
+    pickcode = Column(String(50), default="")
+    ctime = Column(BigInteger, default=0)
+    mtime = Column(BigInteger, default=0)
+    path = Column(Text, default="")
+    extra = Column(Text)
+
+    @staticmethod
+    @db_update
+    def clear(db: Session):
+        """
+        清空文件与文件夹暂存表
+        """
+        db.execute(delete(FileStaging))
+        db.execute(delete(FolderStaging))
+        return True
+
+    @staticmethod
+    @db_update
+    def insert_batch(db: Session, batch: List[Dict]):
+        """
+        批量写入暂存表，ID 重复时覆盖
+        """
+        for model, table in ((FileStaging, "files"), (FolderStaging, "folders")):
+            rows = [entry["data"] for entry in batch if entry["table"] == table]
+            if rows:
+                db.execute(insert(model).prefix_with("OR REPLACE"), rows)
+        return True
+
+    @staticmethod
+    @db_update
+    def swap_subtree(db: Session, path: str):
+        """
+        使用暂存表数据替换路径下的文件与文件夹
+
+        逻辑：
+          - 删除 files 中路径及其子路径下的所有记录
+          - 暂存表数据整体写入，ID 或路径冲突时覆盖
+          - folders 仅写入不删除，全量同步只遍历文件，无法区分空文件夹与已删除的文件夹
+          - 清空暂存表
+          - 以上操作在同一事务中完成，读取方只会看到替换前或替换后的数据
+        """
+        db.execute(
+            delete(File).where(path_subtree(File.path, path)),
+            execution_options={"synchronize_session": False},
+        )
+        for model, staging in ((File, FileStaging), (Folder, FolderStaging)):
+            columns = [column.name for column in staging.__table__.columns]  # noqa
+            db.execute(
+                insert(model)
+                .prefix_with("OR REPLACE")
+                .from_select(columns, select(*staging.__table__.columns))  # noqa
+            )
+            db.execute(delete(staging))
+        return True
+
+
+class FolderStaging(P115StrmHelperBase):
+    """
+    全量同步文件夹暂存类
+    """
+
+    __tablename__ = "folders_staging"
+
+    id = Column(Integer, primary_key=True)
+    parent_id = Column(Integer, nullable=False)
+    name = Column(String(255), nullable=False)
+    path = Column(Text, nullable=False)
@@ -1,9 +1,18 @@
-from typing import Dict, Optional, List
+import threading
+import time
+from itertools import batched
+from typing import Any, Dict, Iterable, Optional, List, Set, Tuple
 from pathlib import Path
 
-from . import DbOper
+from . import DbOper, encode_extra, decode_extra
+from .queue import ct_db_write_queue
 from .models.folder import Folder
 from .models.file import File
+from .models.snapshot import SnapshotFolder, SnapshotFile
+from .models.local_file import LocalFile, LocalIndexDir
+from .models.staging import FileStaging
+from ..core.config import configer
+from ..utils.tree import DirectoryTree
 
 from app.schemas import FileItem
 
@@ -11,18 +20,52 @@ from app.schemas import FileItem
 class FileDbHelper(DbOper):
     """
     文件类数据库操作
+
+    读取时合并写入队列覆盖层中未落库的数据；绕过队列直接写入前先等待队列写入完成，保证写入顺序
     """
 
-    def process_item(self, item: Dict) -> List[Dict]:
+    # 表名与数据类型
+    TABLES = {"files": (File, "file"), "folders": (Folder, "folder")}
+    # 全量同步暂存表为全局共享，清空到替换期间同时只允许一个同步使用
+    staging_lock = threading.Lock()
+
+    def __tables(self, table: Optional[str]):
+        """
+        查询的表，未指定时依次查询文件与文件夹
+        """
+        if table:
+            return ((table, *self.TABLES[table]),)
+        return ((name, *value) for name, value in self.TABLES.items())
+
+    @staticmethod
+    def encode_extra(item: Optional[Dict]) -> Optional[str]:
+        """
+        按配置编码 extra 字段
+        """
+        return encode_extra(
+            item,
+            configer.get_config("db_extra_mode"),
+            configer.get_config("db_extra_fields"),
+        )
+
+    def process_item(self, item: Dict, seen: Optional[Set] = None) -> List[Dict]:
         """
         处理单个项目，分离文件夹和文件数据
+
+        :param seen: 批次内已处理的 (表名, ID) 集合，传入时跳过已处理的数据
         """
         results = []
         ancestors = item.get("ancestors", [])
 
         # 处理祖先文件夹
-        for i, ancestor in enumerate(ancestors[1:-1], start=1):
-            path = "/" + "/".join(a["name"] for a in ancestors[1 : i + 1])
+        path = ""
+        for ancestor in ancestors[1:-1]:
+            path += "/" + ancestor["name"]
+            if seen is not None:
+                key = ("folders", ancestor["id"])
+                if key in seen:
+                    continue
+                seen.add(key)
             results.append(
                 {
                     "table": "folders",
@@ -36,6 +79,11 @@ class FileDbHelper(DbOper):
             )
 
         # 处理文件本身
+        if seen is not None:
+            key = ("files", item["id"])
+            if key in seen:
+                return results
+            seen.add(key)
         results.append(
             {
                 "table": "files",
@@ -49,7 +97,7 @@ class FileDbHelper(DbOper):
                     "ctime": item.get("ctime", 0),
                     "mtime": item.get("mtime", 0),
                     "path": item.get("path", ""),
-                    "extra": str(item) if item else None,
+                    "extra": self.encode_extra(item),
                 },
             }
         )
@@ -73,7 +121,7 @@ class FileDbHelper(DbOper):
                     "ctime": event.get("create_time", 0),
                     "mtime": event.get("update_time", 0),
                     "path": str(file_path),
-                    "extra": str(event),
+                    "extra": self.encode_extra(event),
                 },
             }
         ]
@@ -124,7 +172,7 @@ class FileDbHelper(DbOper):
                         "ctime": item.get("tp", 0),
                         "mtime": item.get("tu", 0),
                         "path": item.get("path", ""),
-                        "extra": str(item),
+                        "extra": self.encode_extra(item),
                     },
                 }
             ]
@@ -149,7 +197,7 @@ class FileDbHelper(DbOper):
                         "ctime": 0,
                         "mtime": int(fileitem.modify_time),
                         "path": str(Path(fileitem.path)),
-                        "extra": "",
+                        "extra": None,
                     },
                 }
             ]
@@ -168,57 +216,253 @@ class FileDbHelper(DbOper):
                 }
             ]
 
+    def reencode_extra(self, batch_size: int = 5000) -> int:
+        """
+        按当前配置重新编码所有文件的 extra 字段
+
+        :return: 修改数量
+        """
+        ct_db_write_queue.flush()
+        count = 0
+        after_id = -1
+        while True:
+            rows = File.get_extra_page(self._db, after_id, batch_size)
+            if not rows:
+                return count
+            after_id = rows[-1][0]
+            updates = []
+            for fid, extra in rows:
+                if extra is None:
+                    continue
+                new_extra = self.encode_extra(decode_extra(extra))
+                if new_extra != extra:
+                    updates.append({"id": fid, "extra": new_extra})
+            File.update_extra_batch(self._db, updates)
+            count += len(updates)
+
     def upsert_batch(self, batch: List[Dict]):
         """
         批量写入或更新数据
         """
+        ct_db_write_queue.flush()
         File.upsert_batch(self._db, batch)
         Folder.upsert_batch(self._db, batch)
         return True
 
-    def get_by_path(self, path: str) -> Optional[Dict]:
+    def clear_staging(self) -> bool:
         """
-        通过路径获取项目
+        清空全量同步暂存表
         """
-        file = File.get_by_path(self._db, path)
-        if file:
-            return {
-                **file.__dict__,
-                "type": "file",
-                "_sa_instance_state": None,
-            }
-        folder = Folder.get_by_path(self._db, path)
-        if folder:
-            return {**folder.__dict__, "type": "folder", "_sa_instance_state": None}
+        return FileStaging.clear(self._db)
+
+    def stage_batch(self, batch: List[Dict]) -> bool:
+        """
+        批量写入全量同步暂存表
+        """
+        return FileStaging.insert_batch(self._db, batch)
+
+    def swap_staging(self, path: str) -> bool:
+        """
+        使用暂存表数据整体替换路径下的数据
+        """
+        ct_db_write_queue.flush()
+        return FileStaging.swap_subtree(self._db, path)
+
+    def enqueue_upsert_batch(self, batch: List[Dict]):
+        """
+        批量写入或更新数据，写入队列未启动时直接写入
+        """
+        if not ct_db_write_queue.upsert(batch):
+            self.upsert_batch(batch)
+        return True
+
+    def enqueue_remove_by_path_batch(self, path: str, only_file: bool = False):
+        """
+        通过路径批量删除，写入队列未启动时直接删除
+        """
+        if not ct_db_write_queue.remove_by_path(path, only_file):
+            self.remove_by_path_batch(path, only_file)
+        return True
+
+    def get_row(
+        self,
+        key: str,
+        value: Any,
+        table: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Optional[Dict]:
+        """
+        通过字段获取单条数据
+
+        :param table: 数据所在表 files 或 folders，未指定时依次查询
+        :param columns: 需要返回的字段，默认全部
+        """
+        select_columns = self.__overlay_columns(columns)
+        for name, model, item_type in self.__tables(table):
+            hit, data = ct_db_write_queue.get(key, value, name)
+            if hit:
+                return {**self.__pick(data, columns), "type": item_type}
+            row = model.get_row_by(self._db, key, value, select_columns)
+            if row and ct_db_write_queue.visible(row._mapping, name):
+                return {**self.__pick(row._mapping, columns), "type": item_type}
         return None
 
-    def get_by_id(self, id: int) -> Optional[Dict]:
+    @staticmethod
+    def __overlay_columns(columns: Optional[List[str]]) -> Optional[List[str]]:
+        """
+        查询字段，写入队列运行时需要额外查询 ID 与路径用于校验覆盖层
+        """
+        if columns and ct_db_write_queue.running:
+            return list(dict.fromkeys([*columns, "id", "path"]))
+        return columns
+
+    @staticmethod
+    def __pick(data, columns: Optional[List[str]]) -> Dict:
+        """
+        按字段筛选数据
+        """
+        if not columns:
+            return dict(data)
+        return {column: data.get(column) for column in columns}
+
+    def get_rows(
+        self,
+        key: str,
+        values: Iterable[Any],
+        table: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[Any, Any]:
+        """
+        通过字段批量获取数据 {字段值: 数据}
+        """
+        if columns and key not in columns:
+            columns = [key, *columns]
+        select_columns = self.__overlay_columns(columns)
+        missing = set(values)
+        result = {}
+        for name, model, _ in self.__tables(table):
+            if not missing:
+                break
+            for value, data in ct_db_write_queue.get_many(key, missing, name).items():
+                result[value] = self.__pick(data, columns)
+                missing.discard(value)
+            for row in model.get_rows_by(self._db, key, missing, select_columns):
+                if not ct_db_write_queue.visible(row._mapping, name):
+                    continue
+                value = row._mapping[key]
+                result[value] = self.__pick(row._mapping, columns)
+                missing.discard(value)
+        return result
+
+    def get_rows_by_ids(
+        self,
+        ids: Iterable[int],
+        table: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[int, Dict]:
+        """
+        通过ID批量获取数据 {ID: 数据}
+        """
+        return self.get_rows("id", ids, table, columns)
+
+    def get_rows_by_paths(
+        self,
+        paths: Iterable[str],
+        table: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[str, Dict]:
+        """
+        通过路径批量获取数据 {路径: 数据}
+        """
+        return self.get_rows("path", paths, table, columns)
+
+    def get_by_path(self, path: str, table: Optional[str] = None) -> Optional[Dict]:
+        """
+        通过路径获取项目
+        """
+        return self.get_row("path", path, table)
+
+    def get_pickcodes_by_paths(self, paths: List[str]) -> Dict[str, str]:
+        """
+        通过路径批量获取文件 pickcode {路径: pickcode}
+
+        路径存在重复数据时直接删除文件重复信息，不返回该路径
+        """
+        pickcodes: Dict[str, str] = {}
+        duplicates = set()
+        queued = ct_db_write_queue.get_many("path", paths, "files")
+        for batch in batched((path for path in paths if path not in queued), 500):
+            for fid, path, pickcode in File.get_pickcodes_by_paths(
+                self._db, list(batch)
+            ):
+                if not ct_db_write_queue.visible({"id": fid, "path": path}, "files"):
+                    continue
+                if path in pickcodes:
+                    duplicates.add(path)
+                pickcodes[path] = pickcode
+        for path in duplicates:
+            self.remove_by_path_batch(path=path, only_file=True)
+            pickcodes.pop(path, None)
+        for path, data in queued.items():
+            pickcodes[path] = data.get("pickcode", "")
+        return pickcodes
+
+    def iter_files_by_prefix(self, prefix: str, batch_size: int = 10_000):
+        """
+        迭代路径前缀下的所有文件，产生 (路径, pickcode)
+        """
+        queued = ct_db_write_queue.items("files", prefix=prefix)
+        for data in queued:
+            yield data["path"], data.get("pickcode", "")
+        queued_ids = {data["id"] for data in queued}
+        after_id = 0
+        while True:
+            rows = File.get_page_by_path_prefix(self._db, prefix, after_id, batch_size)
+            if not rows:
+                return
+            for fid, path, pickcode in rows:
+                if fid in queued_ids or not ct_db_write_queue.visible(
+                    {"id": fid, "path": path}, "files"
+                ):
+                    continue
+                yield path, pickcode
+            after_id = rows[-1][0]
+
+    def iter_folders(self, batch_size: int = 10_000):
+        """
+        迭代所有文件夹，产生 (ID, 路径)
+        """
+        queued = ct_db_write_queue.items("folders")
+        for data in queued:
+            yield data["id"], data["path"]
+        queued_ids = {data["id"] for data in queued}
+        after_id = -1
+        while True:
+            rows = Folder.get_page(self._db, after_id, batch_size)
+            if not rows:
+                return
+            for folder_id, path in rows:
+                if folder_id in queued_ids or not ct_db_write_queue.visible(
+                    {"id": folder_id, "path": path}, "folders"
+                ):
+                    continue
+                yield folder_id, path
+            after_id = rows[-1][0]
+
+    def get_by_id(self, id: int, table: Optional[str] = None) -> Optional[Dict]:
         """
         通过ID获取项目
         """
-        file = File.get_by_id(self._db, id)
-        if file:
-            return {
-                **file.__dict__,
-                "type": "file",
-                "_sa_instance_state": None,
-            }
-        folder = Folder.get_by_id(self._db, id)
-        if folder:
-            return {**folder.__dict__, "type": "folder", "_sa_instance_state": None}
-        return None
+        return self.get_row("id", id, table)
 
     def get_children(self, path: str) -> Dict:
         """
         获取路径下的所有子项
         """
-        parent = Folder.get_by_path(self._db, path)
+        parent = self.get_row("path", path, "folders", ["id"])
         if not parent:
             return {"files": [], "subfolders": []}
-        parent_id = parent.id
-
-        files = File.get_by_parent_id(self._db, parent_id)
-        subfolders = Folder.get_by_parent_id(self._db, parent_id)
+        parent_id = parent["id"]
 
         def clean_record(record):
             d = record.__dict__
@@ -226,9 +470,26 @@ class FileDbHelper(DbOper):
             d["type"] = "file" if isinstance(record, File) else "folder"
             return d
 
+        def children(model, table: str, item_type: str) -> List[Dict]:
+            queued = ct_db_write_queue.items(table, parent_id=parent_id)
+            queued_ids = {data["id"] for data in queued}
+            records = [
+                clean_record(record)
+                for record in model.get_by_parent_id(self._db, parent_id)
+                if record.id not in queued_ids
+            ]
+            return [
+                record
+                for record in records
+                if ct_db_write_queue.visible(record, table)
+            ] + [{**data, "type": item_type} for data in queued]
+
+        files = children(File, "files", "file")
+        subfolders = children(Folder, "folders", "folder")
+
         return {
-            "files": [clean_record(f) for f in files],
-            "subfolders": [clean_record(sf) for sf in subfolders],
+            "files": files,
+            "subfolders": subfolders,
             "meta": {
                 "parent_path": path,
                 "parent_id": parent_id,
@@ -240,37 +501,260 @@ class FileDbHelper(DbOper):
         """
         通过路径批量删除
         """
+        ct_db_write_queue.flush()
         File.remove_by_path_batch(self._db, path)
         if not only_file:
             Folder.remove_by_path_batch(self._db, path)
         return True
 
+    def move_path(self, old_path: str, new_path: str) -> bool:
+        """
+        移动或重命名路径，其下所有文件夹与文件路径一并更新
+        """
+        ct_db_write_queue.flush()
+        File.move_subtree(self._db, old_path, new_path)
+        Folder.move_subtree(self._db, old_path, new_path)
+        return True
+
     def update_path_by_id(self, id: int, new_path: str) -> bool:
         """
         通过ID匹配数据并修改path
         """
-        item = self.get_by_id(id)
-        if not item:
+        ct_db_write_queue.flush()
+        if not self.get_row("id", id, "files", ["id"]):
             return False
-
-        if item["type"] == "file":
-            File.update_path(self._db, id, new_path)
-        else:
-            return False
-
+        File.update_path(self._db, id, new_path)
         return True
 
     def update_name_by_id(self, id: int, new_name: str) -> bool:
         """
         通过ID匹配数据并修改name
         """
-        item = self.get_by_id(id)
-        if not item:
+        ct_db_write_queue.flush()
+        if not self.get_row("id", id, "files", ["id"]):
             return False
+        File.update_name(self._db, id, new_name)
+        return True
 
-        if item["type"] == "file":
-            File.update_name(self._db, id, new_name)
-        else:
+
+class SnapshotDbHelper(DbOper):
+    """
+    网盘目录树快照数据库操作
+    """
+
+    def get_folders(self, mapping: str) -> Dict[int, Tuple[int, int]]:
+        """
+        获取同步映射下所有子目录快照 {folder_id: (mtime, updated_at)}
+        """
+        return SnapshotFolder.get_by_mapping(self._db, mapping)
+
+    def get_files(self, mapping: str, folder_id: int) -> List[Tuple[str, str]]:
+        """
+        获取子目录快照下所有文件 [(本地路径, 网盘路径)]
+        """
+        return SnapshotFile.get_by_folder_id(self._db, mapping, folder_id)
+
+    def replace_folder(
+        self,
+        mapping: str,
+        folder_id: int,
+        mtime: int,
+        updated_at: int,
+        paths: List[Tuple[str, str]],
+    ) -> bool:
+        """
+        替换子目录快照
+
+        先写入文件再写入目录修改时间，中途失败时下次运行会重新导出该子目录
+        """
+        SnapshotFile.replace(self._db, mapping, folder_id, paths)
+        SnapshotFolder.replace(self._db, mapping, folder_id, mtime, updated_at)
+        return True
+
+    def remove_folders(self, mapping: str, folder_ids: List[int]) -> bool:
+        """
+        批量删除子目录快照
+        """
+        if not folder_ids:
+            return True
+        SnapshotFolder.remove_batch(self._db, mapping, folder_ids)
+        SnapshotFile.remove_batch(self._db, mapping, folder_ids)
+        return True
+
+
+class LocalFileDbHelper(DbOper):
+    """
+    本地生成文件索引数据库操作
+
+    记录插件生成的 STRM 文件与下载的媒体信息文件，用于替代扫描本地媒体库
+    """
+
+    @staticmethod
+    def __dir_prefix(local_dir) -> str:
+        """
+        目录前缀
+        """
+        return str(local_dir).rstrip("/") + "/"
+
+    @staticmethod
+    def process_item(local_path, pan_path=None, pickcode: str = None) -> Dict:
+        """
+        生成单条索引数据
+        """
+        return {
+            "local_path": str(local_path),
+            "pan_path": str(pan_path) if pan_path else "",
+            "pickcode": pickcode or "",
+            "mtime": int(time.time()),
+        }
+
+    def add(self, local_path, pan_path=None, pickcode: str = None) -> bool:
+        """
+        写入单条索引
+        """
+        return self.add_batch([self.process_item(local_path, pan_path, pickcode)])
+
+    def add_batch(self, batch: List[Dict]) -> bool:
+        """
+        批量写入索引
+        """
+        LocalFile.upsert_batch(self._db, batch)
+        return True
+
+    def add_tree(self, tree_file) -> bool:
+        """
+        从目录树文件补充索引，已存在的记录保持不变
+        """
+        with open(tree_file, "r", encoding="utf-8") as f:
+            for batch in batched((line.strip() for line in f), 7_000):
+                LocalFile.insert_ignore_batch(
+                    self._db, [self.process_item(path) for path in batch]
+                )
+        return True
+
+    def remove(self, local_path) -> bool:
+        """
+        删除单条索引
+        """
+        return self.remove_batch([str(local_path)])
+
+    def remove_batch(self, local_paths: List[str]) -> bool:
+        """
+        批量删除索引
+        """
+        LocalFile.remove_batch(self._db, local_paths)
+        return True
+
+    def remove_dir(self, local_dir) -> bool:
+        """
+        删除目录下所有索引
+        """
+        LocalFile.remove_by_prefix(self._db, self.__dir_prefix(local_dir))
+        return True
+
+    def rename(self, old_path, new_path) -> bool:
+        """
+        修改索引本地路径
+        """
+        LocalFile.update_local_path(self._db, str(old_path), str(new_path))
+        return True
+
+    def move_dir(self, old_dir, new_dir) -> bool:
+        """
+        本地目录移动或重命名，修改目录下所有索引本地路径
+        """
+        LocalFile.move_local_subtree(self._db, str(old_dir), str(new_dir))
+        return True
+
+    def move_pan_path(self, old_path, new_path) -> bool:
+        """
+        网盘路径移动或重命名，修改对应索引的网盘路径
+        """
+        LocalFile.move_pan_subtree(self._db, str(old_path), str(new_path))
+        return True
+
+    @staticmethod
+    def __extensions_key(extensions=None) -> str:
+        """
+        文件后缀名记录值，不限制后缀名时为 *
+        """
+        if extensions is None:
+            return "*"
+        return ",".join(sorted({ext.lower() for ext in extensions}))
+
+    def is_seeded(self, local_dir, extensions=None) -> bool:
+        """
+        判断目录索引是否已通过完整扫描初始化，且初始化时包含所需的文件后缀名
+        """
+        seeded = LocalIndexDir.get_extensions(self._db, str(local_dir).rstrip("/"))
+        if seeded is None:
+            return False
+        if seeded == "*":
+            return True
+        if extensions is None:
             return False
+        return set(self.__extensions_key(extensions).split(",")) <= set(
+            seeded.split(",")
+        )
 
+    def mark_seeded(self, local_dir, extensions=None) -> bool:
+        """
+        记录目录索引已通过完整扫描初始化
+        """
+        LocalIndexDir.replace(
+            self._db,
+            str(local_dir).rstrip("/"),
+            self.__extensions_key(extensions),
+            int(time.time()),
+        )
         return True
+
+    def export_tree(self, local_dir, output_file, extensions=None) -> int:
+        """
+        导出目录下的索引为目录树文件
+
+        :param local_dir: 本地目录
+        :param output_file: 输出文件路径
+        :param extensions: 要包含的文件后缀名列表
+        :return: 导出数量
+        """
+        if extensions is not None:
+            extensions = {ext.lower() for ext in extensions}
+        with DirectoryTree.open_writer(output_file) as writer:
+            for local_path in LocalFile.get_paths_by_prefix(
+                self._db, self.__dir_prefix(local_dir)
+            ):
+                if extensions is None or Path(local_path).suffix.lower() in extensions:
+                    writer.write(local_path)
+        return writer.count
+
+    def verify(self, local_dir, tree_file, extensions=None) -> Tuple[int, int]:
+        """
+        扫描本地目录校验索引，补充缺失记录并删除失效记录
+
+        :param local_dir: 本地目录
+        :param tree_file: 扫描结果临时目录树文件
+        :param extensions: 要包含的文件后缀名列表
+        :return: (新增数量, 删除数量)
+        """
+        DirectoryTree.scan_directory_to_tree(
+            root_path=local_dir,
+            output_file=tree_file,
+            append=False,
+            extensions=extensions,
+        )
+        with open(tree_file, "r", encoding="utf-8") as f:
+            scanned = set(line.strip() for line in f)
+        indexed = set(
+            LocalFile.get_paths_by_prefix(self._db, self.__dir_prefix(local_dir))
+        )
+        added = scanned - indexed
+        removed = indexed - scanned
+        for batch in batched(added, 7_000):
+            LocalFile.insert_ignore_batch(
+                self._db, [self.process_item(path) for path in batch]
+            )
+        for batch in batched(removed, 7_000):
+            self.remove_batch(list(batch))
+        self.mark_seeded(local_dir, extensions)
+        return len(added), len(removed)
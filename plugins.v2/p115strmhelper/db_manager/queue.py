@@ -0,0 +1,360 @@
+import threading
+from time import monotonic, sleep
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.log import logger
+
+from . import db_transaction
+from .models.file import File
+from .models.folder import Folder
+
+
+class DbWriteQueue:
+    """
+    数据库后台写入队列
+
+    事件类的小批量写入先进入队列，由单个写入线程按数量或时间合并为批量事务，
+    未落库的数据保存在内存覆盖层中，保证写入后立即可读
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 2000,
+        interval: float = 1.0,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+    ):
+        """
+        :param max_rows: 排队数据达到该数量时立即写入
+        :param interval: 首条数据入队后最长等待时间（秒）
+        :param max_retries: 单条操作最多写入次数，超过后放弃该操作
+        :param retry_delay: 写入失败后重试等待时间（秒）
+        """
+        self.max_rows = max_rows
+        self.interval = interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.commit_count = 0
+        self.op_count = 0
+        self.dropped_count = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._flushing = False
+        self._busy = False
+        self._ops: List[Tuple] = []
+        self._rows = 0
+        self._first_at = 0.0
+        self._seq = 0
+        # 覆盖层 {表名: {ID: (序号, 数据)}}
+        self._items: Dict[str, Dict[int, Tuple[int, Dict]]] = {
+            "files": {},
+            "folders": {},
+        }
+        # 覆盖层路径索引 {路径: (表名, ID)}
+        self._paths: Dict[str, Tuple[str, int]] = {}
+        # 待删除路径 [(序号, 路径, 仅文件)]
+        self._removed: List[Tuple[int, str, bool]] = []
+        # 写入失败次数 {序号: 次数}
+        self._retries: Dict[int, int] = {}
+
+    @property
+    def running(self) -> bool:
+        """
+        写入线程是否运行
+        """
+        return self._running
+
+    def start(self):
+        """
+        启动写入线程
+        """
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(
+            target=self.__worker, name="P115DbWriteQueue", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        写入剩余数据并停止写入线程
+        """
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        logger.debug(
+            f"【数据库写入队列】已停止，合并 {self.op_count} 次写入为 {self.commit_count} 次提交，"
+            f"放弃 {self.dropped_count} 次写入"
+        )
+
+    def flush(self):
+        """
+        等待队列中的数据全部写入
+        """
+        with self._cond:
+            if not self._running:
+                return
+            self._flushing = True
+            self._cond.notify_all()
+            while self._ops or self._busy:
+                self._cond.wait()
+            self._flushing = False
+
+    def upsert(self, batch: List[Dict]) -> bool:
+        """
+        批量写入或更新数据入队
+        """
+        if not batch:
+            return True
+        with self._cond:
+            if not self._running:
+                return False
+            seq = self.__enqueue(("upsert", batch), len(batch))
+            for entry in batch:
+                table, data = entry["table"], entry["data"]
+                items = self._items[table]
+                old = items.get(data["id"])
+                if old and self._paths.get(old[1]["path"]) == (table, data["id"]):
+                    self._paths.pop(old[1]["path"], None)
+                stale = self._paths.get(data["path"])
+                if stale and stale[1] != data["id"]:
+                    self._items[stale[0]].pop(stale[1], None)
+                items[data["id"]] = (seq, data)
+                self._paths[data["path"]] = (table, data["id"])
+        return True
+
+    def remove_by_path(self, path: str, only_file: bool = False) -> bool:
+        """
+        通过路径批量删除入队
+        """
+        path = path.rstrip("/")
+        with self._cond:
+            if not self._running:
+                return False
+            seq = self.__enqueue(("remove", path, only_file), 1)
+            self._removed.append((seq, path, only_file))
+            for item_path, (table, rid) in list(self._paths.items()):
+                if (table == "files" or not only_file) and self.__in_path(
+                    item_path, path
+                ):
+                    self._paths.pop(item_path)
+                    self._items[table].pop(rid, None)
+        return True
+
+    def get(self, key: str, value: Any, table: str) -> Tuple[bool, Optional[Dict]]:
+        """
+        从覆盖层获取数据
+
+        :return: (是否命中, 数据)
+        """
+        with self._cond:
+            data = self.__find(key, value, table)
+            return data is not None, data
+
+    def get_many(self, key: str, values: Iterable[Any], table: str) -> Dict[Any, Dict]:
+        """
+        从覆盖层批量获取数据 {字段值: 数据}，仅返回命中的数据
+        """
+        with self._cond:
+            if not self._items[table]:
+                return {}
+            result = {}
+            for value in values:
+                data = self.__find(key, value, table)
+                if data is not None:
+                    result[value] = data
+            return result
+
+    def items(
+        self, table: str, prefix: str = "", parent_id: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        获取覆盖层中路径前缀下或上级目录下的所有数据
+        """
+        with self._cond:
+            return [
+                data
+                for _, data in self._items[table].values()
+                if (not prefix or data["path"].startswith(prefix))
+                and (parent_id is None or data.get("parent_id") == parent_id)
+            ]
+
+    def __find(self, key: str, value: Any, table: str) -> Optional[Dict]:
+        """
+        覆盖层中查找数据
+        """
+        items = self._items[table]
+        if key == "id":
+            item = items.get(value)
+            return item[1] if item else None
+        if key == "path":
+            hit = self._paths.get(value)
+            return items[hit[1]][1] if hit and hit[0] == table else None
+        for _, data in items.values():
+            if data.get(key) == value:
+                return data
+        return None
+
+    def visible(self, row: Dict, table: str) -> bool:
+        """
+        判断数据库中读取的数据是否已被队列中的写入覆盖或删除
+        """
+        with self._cond:
+            if not self._removed and not self._paths:
+                return True
+            item = self._items[table].get(row["id"])
+            if item and item[1]["path"] != row["path"]:
+                return False
+            hit = self._paths.get(row["path"])
+            if hit and hit != (table, row["id"]):
+                return False
+            return not any(
+                (table == "files" or not only_file) and self.__in_path(row["path"], p)
+                for _, p, only_file in self._removed
+            )
+
+    @staticmethod
+    def __in_path(item_path: str, path: str) -> bool:
+        """
+        判断路径是否为目标路径或其子路径
+        """
+        return not path or item_path == path or item_path.startswith(path + "/")
+
+    def __enqueue(self, op: Tuple, rows: int) -> int:
+        """
+        操作入队，返回序号
+        """
+        self._seq += 1
+        if not self._ops:
+            self._first_at = monotonic()
+        self._ops.append((self._seq, op))
+        self._rows += rows
+        self.op_count += 1
+        self._cond.notify_all()
+        return self._seq
+
+    def __worker(self):
+        """
+        写入线程
+        """
+        while True:
+            with self._cond:
+                while self._running and not self._ops:
+                    self._cond.wait()
+                while (
+                    self._running
+                    and not self._flushing
+                    and self._rows < self.max_rows
+                    and (wait := self._first_at + self.interval - monotonic()) > 0
+                ):
+                    self._cond.wait(wait)
+                if not self._ops:
+                    return
+                ops, self._ops, self._rows = self._ops, [], 0
+                self._busy = True
+            done_seq, pending = self.__commit(ops)
+            with self._cond:
+                if pending:
+                    # 未写入的操作按原顺序放回队首，下次重试
+                    self._ops[:0] = pending
+                    self._rows += sum(self.__op_rows(op) for _, op in pending)
+                    self._first_at = monotonic()
+                if done_seq:
+                    self.__release(done_seq)
+                self._busy = False
+                self._cond.notify_all()
+            if pending:
+                sleep(self.retry_delay)
+
+    def __commit(self, ops: List[Tuple]) -> Tuple[int, List[Tuple]]:
+        """
+        写入操作
+
+        逻辑：
+          - 先合并批量写入，失败时按顺序逐条写入
+          - 逐条写入遇到失败的操作即停止，该操作及其后的操作返回重试，保证写入顺序
+          - 单条操作失败次数达到上限时放弃该操作
+
+        :return: (已写入或已放弃的最大序号, 待重试操作)
+        """
+        try:
+            self.__apply([op for _, op in ops])
+            for seq, _ in ops:
+                self._retries.pop(seq, None)
+            return ops[-1][0], []
+        except Exception as e:
+            logger.warning(
+                f"【数据库写入队列】批量写入 {len(ops)} 条操作失败，逐条重试: {e}"
+            )
+        done_seq = 0
+        for index, (seq, op) in enumerate(ops):
+            try:
+                self.__apply([op])
+            except Exception as e:
+                retries = self._retries.get(seq, 0) + 1
+                if retries < self.max_retries:
+                    self._retries[seq] = retries
+                    logger.error(
+                        f"【数据库写入队列】写入失败 {retries} 次，稍后重试: {e}"
+                    )
+                    return done_seq, ops[index:]
+                self.dropped_count += 1
+                logger.error(
+                    f"【数据库写入队列】写入失败 {retries} 次，放弃该操作 {op[0]}: {e}"
+                )
+            self._retries.pop(seq, None)
+            done_seq = seq
+        return done_seq, []
+
+    @staticmethod
+    def __op_rows(op: Tuple) -> int:
+        """
+        操作包含的数据数量
+        """
+        return len(op[1]) if op[0] == "upsert" else 1
+
+    def __apply(self, ops: List[Tuple]):
+        """
+        在同一事务中按顺序执行操作，连续的写入合并为一次批量写入
+        """
+        with db_transaction() as db:
+            batch: List[Dict] = []
+            for op in ops:
+                if op[0] == "upsert":
+                    batch.extend(op[1])
+                    continue
+                if batch:
+                    File.upsert_batch(db, batch)
+                    Folder.upsert_batch(db, batch)
+                    batch = []
+                _, path, only_file = op
+                File.remove_by_path_batch(db, path)
+                if not only_file:
+                    Folder.remove_by_path_batch(db, path)
+            if batch:
+                File.upsert_batch(db, batch)
+                Folder.upsert_batch(db, batch)
+        self.commit_count += 1
+
+    def __release(self, seq: int):
+        """
+        清理已写入数据库的覆盖层数据
+        """
+        for table, items in self._items.items():
+            for rid in [rid for rid, (s, _) in items.items() if s <= seq]:
+                path = items.pop(rid)[1]["path"]
+                if self._paths.get(path) == (table, rid):
+                    self._paths.pop(path)
+        self._removed = [item for item in self._removed if item[0] > seq]
+
+
+# 全局数据库写入队列
+ct_db_write_queue = DbWriteQueue()
@@ -87,6 +87,7 @@ const emit = __emit;
 const loading = ref(true);
 const saveLoading = ref(false);
 const syncLoading = ref(false);
+const rebuildLoading = ref(false);
 ref(false);
 const activeTab = ref('tab-transfer');
 const mediaservers = ref([]);
@@ -123,6 +124,8 @@ const config = reactive({
   increment_sync_scrape_metadata_exclude_paths: '',
   increment_sync_media_server_refresh_enabled: false,
   increment_sync_mediaservers: [],
+  increment_sync_snapshot_enabled: false,
+  increment_sync_snapshot_ttl: 24,
   monitor_life_enabled: false,
   monitor_life_auto_download_mediainfo_enabled: false,
   monitor_life_paths: '',
@@ -147,7 +150,20 @@ const config = reactive({
   directory_upload_mode: 'compatibility',
   directory_upload_uploadext: 'mp4,mkv,ts,iso,rmvb,avi,mov,mpeg,mpg,wmv,3gp,asf,m4v,flv,m2ts,tp,f4v',
   directory_upload_copyext: 'srt,ssa,ass',
-  directory_upload_path: []
+  directory_upload_path: [],
+  sync_tree_diff_mode: 'memory',
+  local_index_enabled: false,
+  local_index_verify_cron: '',
+  strm_writer_workers: 4,
+  strm_writer_atomic: false,
+  db_profile: 'default',
+  db_write_queue_enabled: false,
+  full_sync_db_staging_enabled: false,
+  id_path_cache_size: 100000,
+  redirect_url_cache_size: 1024,
+  db_extra_mode: 'full',
+  db_extra_fields: 'ico,thumb,u,play_long,star,m,labels,fl',
+  db_extra_reencode: false
 });
 
 // 消息提示
@@ -627,6 +643,43 @@ const triggerFullSync = async () => {
   }
 };
 
+// 触发从数据库重建STRM
+const triggerRebuildStrm = async () => {
+  rebuildLoading.value = true;
+  message.text = '';
+
+  try {
+    // 检查插件是否已启用
+    if (!config.enabled) {
+      throw new Error('插件未启用，请先启用插件');
+    }
+
+    // 同步路径设置到配置对象
+    config.full_sync_strm_paths = generatePathsConfig(fullSyncPaths.value, 'fullSync');
+
+    // 检查是否有有效路径配置
+    if (!config.full_sync_strm_paths) {
+      throw new Error('请先配置全量同步路径');
+    }
+
+    // 调用API触发从数据库重建STRM
+    const result = await props.api.post(`plugin/${PLUGIN_ID}/rebuild_strm`);
+
+    if (result && result.code === 0) {
+      message.text = result.msg || '从数据库重建STRM任务已启动';
+      message.type = 'success';
+    } else {
+      throw new Error(result?.msg || '启动从数据库重建STRM失败');
+    }
+  } catch (err) {
+    message.text = `启动从数据库重建STRM失败: ${err.message || '未知错误'}`;
+    message.type = 'error';
+    console.error('启动从数据库重建STRM失败:', err);
+  } finally {
+    rebuildLoading.value = false;
+  }
+};
+
 // 路径管理方法
 const addPath = (type) => {
   switch (type) {
@@ -1683,6 +1736,24 @@ return (_ctx, _cache) => {
                               _cache[72] || (_cache[72] = _createTextVNode("目录上传 "))
                             ]),
                             _: 1
+                          }),
+                          _createVNode(_component_v_tab, {
+                            value: "tab-performance",
+                            class: "text-caption"
+                          }, {
+                            default: _withCtx(() => [
+                              _createVNode(_component_v_icon, {
+                                size: "small",
+                                start: ""
+                              }, {
+                                default: _withCtx(() => _cache[157] || (_cache[157] = [
+                                  _createTextVNode("mdi-speedometer")
+                                ])),
+                                _: 1
+                              }),
+                              _cache[158] || (_cache[158] = _createTextVNode("性能优化 "))
+                            ]),
+                            _: 1
                           })
                         ]),
                         _: 1
@@ -2029,7 +2100,8 @@ return (_ctx, _cache) => {
                                             label: "覆盖模式",
                                             items: [
                         { title: '总是', value: 'always' },
-                        { title: '从不', value: 'never' }
+                        { title: '从不', value: 'never' },
+                        { title: '仅内容变化', value: 'changed' }
                       ],
                                             chips: "",
                                             "closable-chips": ""
@@ -2299,6 +2371,44 @@ return (_ctx, _cache) => {
                                     ]),
                                     _: 1
                                   }),
+                                  _createVNode(_component_v_row, null, {
+                                    default: _withCtx(() => [
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "3"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_switch, {
+                                            modelValue: config.increment_sync_snapshot_enabled,
+                                            "onUpdate:modelValue": _cache[141] || (_cache[141] = $event => ((config.increment_sync_snapshot_enabled) = $event)),
+                                            label: "目录树快照",
+                                            color: "primary"
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      }),
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "3"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_text_field, {
+                                            modelValue: config.increment_sync_snapshot_ttl,
+                                            "onUpdate:modelValue": _cache[142] || (_cache[142] = $event => ((config.increment_sync_snapshot_ttl) = $event)),
+                                            modelModifiers: { number: true },
+                                            label: "快照过期时间（小时）",
+                                            type: "number",
+                                            density: "compact",
+                                            disabled: !config.increment_sync_snapshot_enabled,
+                                            hint: "超过此时间的子目录快照会重新导出",
+                                            "persistent-hint": ""
+                                          }, null, 8, ["modelValue", "disabled"])
+                                        ]),
+                                        _: 1
+                                      })
+                                    ]),
+                                    _: 1
+                                  }),
                                   (config.increment_sync_scrape_metadata_enabled)
                                     ? (_openBlock(), _createBlock(_component_v_row, {
                                         key: 0,
@@ -3411,6 +3521,282 @@ return (_ctx, _cache) => {
                               })
                             ]),
                             _: 1
+                          }),
+                          _createVNode(_component_v_window_item, { value: "tab-performance" }, {
+                            default: _withCtx(() => [
+                              _createVNode(_component_v_card_text, null, {
+                                default: _withCtx(() => [
+                                  _createVNode(_component_v_row, null, {
+                                    default: _withCtx(() => [
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_select, {
+                                            modelValue: config.sync_tree_diff_mode,
+                                            "onUpdate:modelValue": _cache[143] || (_cache[143] = $event => ((config.sync_tree_diff_mode) = $event)),
+                                            label: "目录树对比模式",
+                                            items: [
+                                              { title: '内存', value: 'memory' },
+                                              { title: '外部排序', value: 'external' }
+                                            ],
+                                            chips: "",
+                                            "closable-chips": ""
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      }),
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_switch, {
+                                            modelValue: config.local_index_enabled,
+                                            "onUpdate:modelValue": _cache[144] || (_cache[144] = $event => ((config.local_index_enabled) = $event)),
+                                            label: "本地文件索引",
+                                            color: "primary"
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      }),
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_VCronField, {
+                                            modelValue: config.local_index_verify_cron,
+                                            "onUpdate:modelValue": _cache[145] || (_cache[145] = $event => ((config.local_index_verify_cron) = $event)),
+                                            label: "本地文件索引校验周期",
+                                            hint: "定期扫描本地媒体库校验索引，留空不校验",
+                                            "persistent-hint": "",
+                                            density: "compact"
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      })
+                                    ]),
+                                    _: 1
+                                  }),
+                                  _createVNode(_component_v_row, null, {
+                                    default: _withCtx(() => [
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_text_field, {
+                                            modelValue: config.strm_writer_workers,
+                                            "onUpdate:modelValue": _cache[146] || (_cache[146] = $event => ((config.strm_writer_workers) = $event)),
+                                            modelModifiers: { number: true },
+                                            label: "STRM写入线程数",
+                                            type: "number",
+                                            hint: "全量同步时并发写入STRM文件，0 为同步写入",
+                                            "persistent-hint": "",
+                                            density: "compact"
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      }),
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_switch, {
+                                            modelValue: config.strm_writer_atomic,
+                                            "onUpdate:modelValue": _cache[147] || (_cache[147] = $event => ((config.strm_writer_atomic) = $event)),
+                                            label: "STRM原子写入",
+                                            color: "primary"
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      }),
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_select, {
+                                            modelValue: config.db_profile,
+                                            "onUpdate:modelValue": _cache[148] || (_cache[148] = $event => ((config.db_profile) = $event)),
+                                            label: "数据库性能配置",
+                                            items: [
+                                              { title: '默认', value: 'default' },
+                                              { title: '均衡', value: 'balanced' },
+                                              { title: '高性能', value: 'performance' }
+                                            ],
+                                            chips: "",
+                                            "closable-chips": ""
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      })
+                                    ]),
+                                    _: 1
+                                  }),
+                                  _createVNode(_component_v_row, null, {
+                                    default: _withCtx(() => [
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_select, {
+                                            modelValue: config.db_extra_mode,
+                                            "onUpdate:modelValue": _cache[149] || (_cache[149] = $event => ((config.db_extra_mode) = $event)),
+                                            label: "文件附加数据存储",
+                                            items: [
+                                              { title: '完整', value: 'full' },
+                                              { title: '精简', value: 'compact' },
+                                              { title: '不存储', value: 'none' }
+                                            ],
+                                            chips: "",
+                                            "closable-chips": ""
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      }),
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_text_field, {
+                                            modelValue: config.db_extra_fields,
+                                            "onUpdate:modelValue": _cache[150] || (_cache[150] = $event => ((config.db_extra_fields) = $event)),
+                                            label: "精简模式保留字段",
+                                            disabled: config.db_extra_mode !== 'compact',
+                                            hint: "逗号分隔",
+                                            "persistent-hint": "",
+                                            density: "compact"
+                                          }, null, 8, ["modelValue", "disabled"])
+                                        ]),
+                                        _: 1
+                                      }),
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_switch, {
+                                            modelValue: config.db_write_queue_enabled,
+                                            "onUpdate:modelValue": _cache[151] || (_cache[151] = $event => ((config.db_write_queue_enabled) = $event)),
+                                            label: "数据库后台写入",
+                                            color: "primary"
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      })
+                                    ]),
+                                    _: 1
+                                  }),
+                                  _createVNode(_component_v_row, null, {
+                                    default: _withCtx(() => [
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_switch, {
+                                            modelValue: config.db_extra_reencode,
+                                            "onUpdate:modelValue": _cache[152] || (_cache[152] = $event => ((config.db_extra_reencode) = $event)),
+                                            label: "重新编码已有附加数据",
+                                            color: "primary",
+                                            hint: "保存后按当前存储模式处理已有数据并回收空间，执行后自动关闭",
+                                            "persistent-hint": ""
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      })
+                                    ]),
+                                    _: 1
+                                  }),
+                                  _createVNode(_component_v_row, null, {
+                                    default: _withCtx(() => [
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_switch, {
+                                            modelValue: config.full_sync_db_staging_enabled,
+                                            "onUpdate:modelValue": _cache[153] || (_cache[153] = $event => ((config.full_sync_db_staging_enabled) = $event)),
+                                            label: "全量同步数据库整体替换",
+                                            color: "primary"
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      }),
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_text_field, {
+                                            modelValue: config.id_path_cache_size,
+                                            "onUpdate:modelValue": _cache[154] || (_cache[154] = $event => ((config.id_path_cache_size) = $event)),
+                                            modelModifiers: { number: true },
+                                            label: "路径缓存条目数",
+                                            type: "number",
+                                            hint: "文件夹ID与路径内存缓存数量，每万条约占用数MB内存",
+                                            "persistent-hint": "",
+                                            density: "compact"
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      }),
+                                      _createVNode(_component_v_col, {
+                                        cols: "12",
+                                        md: "4"
+                                      }, {
+                                        default: _withCtx(() => [
+                                          _createVNode(_component_v_text_field, {
+                                            modelValue: config.redirect_url_cache_size,
+                                            "onUpdate:modelValue": _cache[155] || (_cache[155] = $event => ((config.redirect_url_cache_size) = $event)),
+                                            modelModifiers: { number: true },
+                                            label: "302下载地址缓存数量",
+                                            type: "number",
+                                            hint: "按 pickcode、UA 缓存115下载地址，有效期跟随链接过期时间",
+                                            "persistent-hint": "",
+                                            density: "compact"
+                                          }, null, 8, ["modelValue"])
+                                        ]),
+                                        _: 1
+                                      })
+                                    ]),
+                                    _: 1
+                                  }),
+                                  _createVNode(_component_v_alert, {
+                                    type: "info",
+                                    variant: "tonal",
+                                    density: "compact",
+                                    class: "mt-2"
+                                  }, {
+                                    default: _withCtx(() => _cache[156] || (_cache[156] = [
+                                      _createTextVNode(" 目录树对比模式：内存模式速度最快；外部排序模式分块排序后归并对比，内存占用固定，适合超大媒体库。"),
+                                      _createElementVNode("br", null, null, -1),
+                                      _createTextVNode("本地文件索引：记录插件生成的STRM与媒体数据文件，同步时直接读取索引而不扫描本地媒体库。"),
+                                      _createElementVNode("br", null, null, -1),
+                                      _createTextVNode("STRM原子写入：先写入临时文件再重命名，避免媒体服务器读取到写入一半的文件。"),
+                                      _createElementVNode("br", null, null, -1),
+                                      _createTextVNode("数据库性能配置：均衡与高性能模式启用WAL，读写分离，避免同步任务长时间写入时出现数据库锁定。"),
+                                      _createElementVNode("br", null, null, -1),
+                                      _createTextVNode("文件附加数据存储：数据库中额外保存的115原始文件数据，精简模式仅保留指定字段，可大幅减小数据库体积；修改后仅对新写入数据生效，开启重新编码后处理已有数据。"),
+                                      _createElementVNode("br", null, null, -1),
+                                      _createTextVNode("数据库后台写入：生活事件、整理事件等零散的数据库写入由后台线程合并为批量提交，插件停止时自动写入剩余数据。"),
+                                      _createElementVNode("br", null, null, -1),
+                                      _createTextVNode("全量同步数据库整体替换：全量同步时数据先写入暂存表，完成后一次性替换同步目录下的数据库记录，并清理网盘已不存在的文件记录。")
+                                    ])),
+                                    _: 1
+                                  })
+                                ]),
+                                _: 1
+                              })
+                            ]),
+                            _: 1
                           })
                         ]),
                         _: 1
@@ -3453,6 +3839,19 @@ return (_ctx, _cache) => {
               ])),
               _: 1
             }, 8, ["loading"]),
+            _createVNode(_component_v_btn, {
+              color: "info",
+              variant: "text",
+              onClick: triggerRebuildStrm,
+              loading: rebuildLoading.value,
+              size: "small",
+              "prepend-icon": "mdi-database-refresh"
+            }, {
+              default: _withCtx(() => _cache[159] || (_cache[159] = [
+                _createTextVNode(" 数据库重建 ")
+              ])),
+              _: 1
+            }, 8, ["loading"]),
             _createVNode(_component_v_btn, {
               color: "success",
               variant: "text",
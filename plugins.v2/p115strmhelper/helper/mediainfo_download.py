@@ -1,6 +1,6 @@
 import time
 from pathlib import Path
-from typing import List, cast
+from typing import List, Optional, cast
 from errno import EIO, ENOENT
 from urllib.parse import unquote, urlsplit
 
@@ -11,6 +11,7 @@ from p115rsacipher import encrypt, decrypt
 from app.log import logger
 from app.core.config import settings
 
+from ..db_manager.oper import LocalFileDbHelper
 from ..utils.http import check_response
 from ..utils.url import Url
 
@@ -22,6 +23,7 @@ class MediaInfoDownloader:
 
     def __init__(self, cookie: str):
         self.cookie = cookie
+        self.localfilehelper = LocalFileDbHelper()
 
     @staticmethod
     def is_file_leq_1k(file_path):
@@ -53,9 +55,19 @@ class MediaInfoDownloader:
         data["file_name"] = unquote(urlsplit(data["url"]).path.rpartition("/")[-1])
         return Url.of(data["url"], data)
 
-    def save_mediainfo_file(self, file_path: Path, file_name: str, download_url: str):
+    def save_mediainfo_file(
+        self,
+        file_path: Path,
+        file_name: str,
+        download_url: str,
+        pan_path: str = None,
+        pickcode: str = None,
+        local_index_list: Optional[List] = None,
+    ):
         """
         保存媒体信息文件
+
+        :param local_index_list: 传入时索引数据追加到列表中由调用方批量写入，否则直接写入
         """
         file_path.parent.mkdir(parents=True, exist_ok=True)
         with requests.get(
@@ -71,9 +83,21 @@ class MediaInfoDownloader:
             with open(file_path, "wb") as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     f.write(chunk)
+        if local_index_list is None:
+            self.localfilehelper.add(file_path, pan_path, pickcode)
+        else:
+            local_index_list.append(
+                self.localfilehelper.process_item(file_path, pan_path, pickcode)
+            )
         logger.info(f"【媒体信息文件下载】保存 {file_name} 文件成功: {file_path}")
 
-    def local_downloader(self, pickcode: str, path: Path):
+    def local_downloader(
+        self,
+        pickcode: str,
+        path: Path,
+        pan_path: str = None,
+        local_index_list: Optional[List] = None,
+    ):
         """
         下载用户网盘文件
         """
@@ -87,10 +111,19 @@ class MediaInfoDownloader:
             file_path=path,
             file_name=path.name,
             download_url=download_url,
+            pan_path=pan_path,
+            pickcode=pickcode,
+            local_index_list=local_index_list,
         )
 
     def share_downloader(
-        self, share_code: str, receive_code: str, file_id: str, path: Path
+        self,
+        share_code: str,
+        receive_code: str,
+        file_id: str,
+        path: Path,
+        pan_path: str = None,
+        local_index_list: Optional[List] = None,
     ):
         """
         下载分享链接文件
@@ -128,6 +161,8 @@ class MediaInfoDownloader:
             file_path=path,
             file_name=path.name,
             download_url=download_url,
+            pan_path=pan_path,
+            local_index_list=local_index_list,
         )
 
     def auto_downloader(self, downloads_list: List):
@@ -137,6 +172,7 @@ class MediaInfoDownloader:
         mediainfo_count: int = 0
         mediainfo_fail_count: int = 0
         mediainfo_fail_dict: List = []
+        local_index_list: List = []
         try:
             for item in downloads_list:
                 if not item:
@@ -146,7 +182,10 @@ class MediaInfoDownloader:
                     try:
                         for _ in range(3):
                             self.local_downloader(
-                                pickcode=item["pickcode"], path=Path(item["path"])
+                                pickcode=item["pickcode"],
+                                path=Path(item["path"]),
+                                pan_path=item.get("pan_path"),
+                                local_index_list=local_index_list,
                             )
                             if not self.is_file_leq_1k(item["path"]):
                                 mediainfo_count += 1
@@ -171,6 +210,8 @@ class MediaInfoDownloader:
                                 receive_code=item["receive_code"],
                                 file_id=item["file_id"],
                                 path=Path(item["path"]),
+                                pan_path=item.get("pan_path"),
+                                local_index_list=local_index_list,
                             )
                             if not self.is_file_leq_1k(item["path"]):
                                 mediainfo_count += 1
@@ -194,4 +235,7 @@ class MediaInfoDownloader:
                     time.sleep(2)
         except Exception as e:
             logger.error(f"【媒体信息文件下载】出现未知错误: {e}")
+        finally:
+            if local_index_list:
+                self.localfilehelper.add_batch(local_index_list)
         return mediainfo_count, mediainfo_fail_count, mediainfo_fail_dict
@@ -1,20 +1,22 @@
 import time
 import threading
 import shutil
-from typing import List, Dict, Optional
+from collections import defaultdict
+from queue import Queue, Empty, Full
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 from itertools import batched
 
-from sqlalchemy.orm.exc import MultipleResultsFound
 from p115client.tool.export_dir import export_dir_parse_iter
 from p115client.tool.fs_files import iter_fs_files
 from p115client.tool.iterdir import iter_files_with_path, share_iterdir
 
 from ..core.cache import IdPathCache
+from ..core.writer import StrmWriter
 from ..utils.tree import DirectoryTree
 from ..core.scrape_metadata import media_scrape_metadata
 from ..helper.mediainfo_download import MediaInfoDownloader
-from ..db_manager.oper import FileDbHelper
+from ..db_manager.oper import FileDbHelper, SnapshotDbHelper, LocalFileDbHelper
 from ..utils.path import PathMatchingHelper
 
 from app.log import logger
@@ -28,6 +30,11 @@ class IncrementSyncStrmHelper:
     增量同步 STRM 文件
     """
 
+    # 流水线队列最大长度
+    PIPELINE_QUEUE_SIZE = 10_000
+    # 批量获取 pickcode 的路径数量
+    PICKCODE_BATCH_SIZE = 500
+
     def __init__(
         self,
         client,
@@ -45,6 +52,11 @@ class IncrementSyncStrmHelper:
         mediainfodownloader: MediaInfoDownloader,
         id_path_cache: IdPathCache,
         auto_download_mediainfo: bool = False,
+        snapshot_enabled: bool = False,
+        snapshot_ttl: int = 24,
+        tree_diff_mode: str = "memory",
+        local_index_enabled: bool = False,
+        strm_writer: Optional[StrmWriter] = None,
     ):
         self.client = client
         self.rmt_mediaext = [
@@ -75,7 +87,16 @@ class IncrementSyncStrmHelper:
         self.pathmatchinghelper = PathMatchingHelper()
         self.mediainfodownloader = mediainfodownloader
         self.id_path_cache = id_path_cache
-        self.download_mediainfo_list = []
+        self.mediainfo_queue: Optional[Queue] = None
+        self.snapshot_enabled = snapshot_enabled
+        self.snapshot_ttl = snapshot_ttl * 60 * 60
+        self.snapshothelper = SnapshotDbHelper()
+        self.snapshot_add_count = 0
+        self.snapshot_remove_count = 0
+        self.tree_diff_mode = tree_diff_mode
+        self.local_index_enabled = local_index_enabled
+        self.localfilehelper = LocalFileDbHelper()
+        self.strm_writer = strm_writer or StrmWriter()
 
         # 临时文件配置
         temp_path = settings.PLUGIN_DATA_PATH / "p115strmhelper" / "temp"
@@ -83,36 +104,154 @@ class IncrementSyncStrmHelper:
         self.pan_tree = temp_path / "increment_pan_tree.txt"
         self.pan_to_local_tree = temp_path / "increment_pan_to_local_tree.txt"
 
-    def __itertree(self, pan_path: str, local_path: str):
+    def __map_path(self, item_path: Path, pan_path: str, local_path: str):
+        """
+        网盘路径转换为本地路径，不需要处理的文件返回 None
+        """
+        if item_path.name != item_path.stem:
+            if item_path.suffix in self.rmt_mediaext:
+                return (
+                    str(
+                        Path(local_path)
+                        / Path(item_path.relative_to(pan_path)).with_suffix(".strm")
+                    ),
+                    str(item_path),
+                )
+            elif (
+                item_path.suffix in self.download_mediaext
+                and self.auto_download_mediainfo
+            ):
+                return (
+                    str(Path(local_path) / Path(item_path.relative_to(pan_path))),
+                    str(item_path),
+                )
+        return None
+
+    def __itertree(self, pan_path: str, local_path: str, cid: Optional[int] = None):
         """
         迭代目录树
         """
         parts = Path(pan_path).parts
-        cid = int(self.client.fs_dir_getid(pan_path)["id"])
-        self.api_count += 2
+        if cid is None:
+            cid = int(self.client.fs_dir_getid(pan_path)["id"])
+            self.api_count += 1
+        self.api_count += 1
         for item in export_dir_parse_iter(
             client=self.client, export_file_ids=cid, delete=True
         ):
             item_path = Path(pan_path) / Path(item).relative_to(
                 "/" + parts[-2] + "/" + parts[-1]
             )
-            if item_path.name != item_path.stem:
-                if item_path.suffix in self.rmt_mediaext:
-                    yield (
-                        str(
-                            Path(local_path)
-                            / Path(item_path.relative_to(pan_path)).with_suffix(".strm")
-                        ),
-                        str(item_path),
-                    )
-                elif (
-                    item_path.suffix in self.download_mediaext
-                    and self.auto_download_mediainfo
+            paths = self.__map_path(item_path, pan_path, local_path)
+            if paths:
+                yield paths
+
+    def __iter_snapshot_tree(self, pan_media_dir: str, target_dir: str):
+        """
+        基于快照迭代目录树
+
+        只重新导出修改时间变化或快照过期的一级子目录，其余子目录直接读取快照
+        """
+        mapping = f"{target_dir}#{pan_media_dir}"
+        now = int(time.time())
+        snapshot_folders = self.snapshothelper.get_folders(mapping)
+
+        cid = int(self.client.fs_dir_getid(pan_media_dir)["id"])
+        self.api_count += 1
+
+        # 列出一级子目录，根目录下的文件直接处理
+        current_folders: Dict[int, Tuple[int, str]] = {}
+        for item in self.__iterdir(cid=cid, path=pan_media_dir):
+            if "fid" in item:
+                paths = self.__map_path(Path(item["path"]), pan_media_dir, target_dir)
+                if paths:
+                    yield paths
+                continue
+            mtime = int(item.get("te") or item.get("tu") or 0)
+            current_folders[int(item["cid"])] = (mtime, item["path"])
+
+        changed_folders: List[int] = []
+        for folder_id, (mtime, _) in current_folders.items():
+            snapshot = snapshot_folders.get(folder_id)
+            if (
+                snapshot
+                and mtime
+                and snapshot[0] == mtime
+                and now - snapshot[1] < self.snapshot_ttl
+            ):
+                yield from self.snapshothelper.get_files(mapping, folder_id)
+            else:
+                changed_folders.append(folder_id)
+
+        logger.info(
+            f"【增量STRM生成】快照命中 {len(current_folders) - len(changed_folders)} 个子目录，"
+            f"需要重新导出 {len(changed_folders)} 个子目录"
+        )
+
+        new_files: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+        if len(changed_folders) > max(1, len(current_folders) // 2):
+            # 变化子目录过多时直接导出整个媒体目录，再按一级子目录拆分
+            name_to_id = {
+                Path(current_folders[folder_id][1]).name: folder_id
+                for folder_id in changed_folders
+            }
+            for paths in self.__itertree(
+                pan_path=pan_media_dir, local_path=target_dir, cid=cid
+            ):
+                parts = Path(paths[1]).relative_to(pan_media_dir).parts
+                if len(parts) < 2:
+                    continue
+                folder_id = name_to_id.get(parts[0])
+                if folder_id is None:
+                    continue
+                new_files[folder_id].append(paths)
+                yield paths
+        else:
+            for folder_id in changed_folders:
+                folder_path = current_folders[folder_id][1]
+                for paths in self.__itertree(
+                    pan_path=folder_path,
+                    local_path=str(
+                        Path(target_dir) / Path(folder_path).relative_to(pan_media_dir)
+                    ),
+                    cid=folder_id,
                 ):
-                    yield (
-                        str(Path(local_path) / Path(item_path.relative_to(pan_path))),
-                        str(item_path),
-                    )
+                    new_files[folder_id].append(paths)
+                    yield paths
+
+        # 对比快照计算新增和删除，并更新快照
+        for folder_id in changed_folders:
+            paths = new_files.get(folder_id, [])
+            if folder_id in snapshot_folders:
+                old_paths = set(self.snapshothelper.get_files(mapping, folder_id))
+            else:
+                old_paths = set()
+            new_paths = set(paths)
+            self.snapshot_add_count += len(new_paths - old_paths)
+            self.snapshot_remove_count += len(old_paths - new_paths)
+            self.snapshothelper.replace_folder(
+                mapping=mapping,
+                folder_id=folder_id,
+                mtime=current_folders[folder_id][0],
+                updated_at=now,
+                paths=paths,
+            )
+
+        removed_folders = [
+            folder_id
+            for folder_id in snapshot_folders
+            if folder_id not in current_folders
+        ]
+        for folder_id in removed_folders:
+            self.snapshot_remove_count += len(
+                self.snapshothelper.get_files(mapping, folder_id)
+            )
+        self.snapshothelper.remove_folders(mapping, removed_folders)
+
+        logger.info(
+            f"【增量STRM生成】快照对比完成，新增 {self.snapshot_add_count} 个文件，"
+            f"删除 {self.snapshot_remove_count} 个文件"
+        )
 
     def __iterdir(self, cid: int, path: str):
         """
@@ -122,53 +261,87 @@ class IncrementSyncStrmHelper:
         for batch in iter_fs_files(self.client, cid):
             self.api_count += 1
             for item in batch.get("data", []):
-                item["path"] = path + "/" + item.get("n")
+                item["path"] = path.rstrip("/") + "/" + item.get("n")
                 yield item
 
+    def __list_dir(self, cid: int, path: str) -> Dict[str, Dict]:
+        """
+        列出网盘目录并写入数据库，返回 {路径: 原始数据}
+        """
+        items: Dict[str, Dict] = {}
+        for batch in batched(self.__iterdir(cid=cid, path=path), 7_000):
+            processed: List = []
+            for item in batch:
+                items[item["path"]] = item
+                processed.extend(self.databasehelper.process_fs_files_item(item))
+                if "fid" not in item:
+                    self.id_path_cache.add_cache(
+                        id=int(item["cid"]), directory=item["path"]
+                    )
+            self.databasehelper.enqueue_upsert_batch(processed)
+        return items
+
     def __get_cid_by_path(self, path: str):
         """
         通过路径获取 cid
-        先从缓存获取，再从数据库获取
+        先从缓存获取（内存、数据库）
         """
         cid = self.id_path_cache.get_id_by_dir(path)
         if not cid:
-            # 这里如果有多条重复数据就不进行删除文件夹操作了，说明数据库重复过多，直接放弃
-            data = self.databasehelper.get_by_path(path=path)
-            if data:
-                cid = data.get("id", None)
-                if cid:
-                    logger.debug(f"【增量STRM生成】获取 {path} cid（数据库）: {cid}")
-                    self.id_path_cache.add_cache(id=int(cid), directory=path)
-                    return int(cid)
             return None
         logger.debug(f"【增量STRM生成】获取 {path} cid（缓存）: {cid}")
         return int(cid)
 
-    def __get_pickcode(self, path: str):
+    def __get_dir_cid(self, path: str, listed: Dict[str, Dict]) -> Optional[int]:
         """
-        通过路径获取 pickcode
+        获取目录 cid，缓存和数据库均未命中时从上级目录逐级列出
         """
-        while True:
-            # 这里如果有多条重复数据直接删除文件重复信息，然后迭代重新获取
-            try:
-                file_item = self.databasehelper.get_by_path(path=path)
-            except MultipleResultsFound:
-                self.databasehelper.remove_by_path_batch(path=path, only_file=True)
-                file_item = None
-            if file_item:
-                return file_item.get("pickcode")
-            file_path = Path(path)
-            for part in file_path.parents:
-                cid = self.__get_cid_by_path(str(part))
-                if cid:
-                    temp_path = part
-                    break
-            for batch in batched(self.__iterdir(cid=cid, path=str(temp_path)), 7_000):
-                processed: List = []
-                for item in batch:
-                    processed.extend(self.databasehelper.process_fs_files_item(item))
-                self.databasehelper.upsert_batch(processed)
-            time.sleep(2)
+        if path == "/":
+            return 0
+        cid = self.__get_cid_by_path(path)
+        if cid:
+            return cid
+        parent = str(Path(path).parent)
+        if parent not in listed:
+            parent_cid = self.__get_dir_cid(parent, listed)
+            if parent_cid is None:
+                return None
+            listed[parent] = self.__list_dir(cid=parent_cid, path=parent)
+        item = listed[parent].get(path)
+        if item and "fid" not in item:
+            return int(item["cid"])
+        return None
+
+    def __get_pickcodes(self, paths: List[str]) -> Dict[str, str]:
+        """
+        批量通过路径获取 pickcode
+
+        先批量查询数据库，未命中的路径按父目录分组，每个目录只列出一次
+        """
+        pickcodes = self.databasehelper.get_pickcodes_by_paths(paths)
+
+        missing: Dict[str, List[str]] = defaultdict(list)
+        for path in paths:
+            if not pickcodes.get(path):
+                missing[str(Path(path).parent)].append(path)
+
+        listed: Dict[str, Dict] = {}
+        for parent, parent_paths in missing.items():
+            if parent not in listed:
+                try:
+                    cid = self.__get_dir_cid(parent, listed)
+                    if cid is None:
+                        logger.warn(f"【增量STRM生成】无法获取目录 cid: {parent}")
+                        continue
+                    listed[parent] = self.__list_dir(cid=cid, path=parent)
+                except Exception as e:
+                    logger.error(f"【增量STRM生成】列出网盘目录 {parent} 失败: {e}")
+                    continue
+            for path in parent_paths:
+                item = listed[parent].get(path)
+                if item and "fid" in item:
+                    pickcodes[path] = item.get("pc")
+        return pickcodes
 
     @property
     def service_infos(self) -> Optional[Dict[str, ServiceInfo]]:
@@ -256,16 +429,37 @@ class IncrementSyncStrmHelper:
             """
             后台运行任务
             """
+            extensions = (
+                [".strm"]
+                if not self.auto_download_mediainfo
+                else [".strm"] + self.download_mediaext
+            )
+            if self.local_index_enabled and self.localfilehelper.is_seeded(
+                target_dir, extensions
+            ):
+                count = self.localfilehelper.export_tree(
+                    local_dir=target_dir, output_file=local_tree, extensions=extensions
+                )
+                logger.info(
+                    f"【增量STRM生成】从本地索引读取媒体库文件完成: {target_dir}，共 {count} 个文件"
+                )
+                return
             logger.info(f"【增量STRM生成】开始扫描本地媒体库文件: {target_dir}")
-            tree.scan_directory_to_tree(
+            count, elapsed = tree.scan_directory_to_tree(
                 root_path=target_dir,
                 output_file=local_tree,
                 append=False,
-                extensions=[".strm"]
-                if not self.auto_download_mediainfo
-                else [".strm"] + self.download_mediaext,
+                extensions=extensions,
+            )
+            if self.local_index_enabled:
+                # 本地索引未初始化时使用扫描结果初始化
+                self.localfilehelper.add_tree(local_tree)
+                self.localfilehelper.mark_seeded(target_dir, extensions)
+            logger.info(
+                f"【增量STRM生成】扫描本地媒体库文件完成: {target_dir}，"
+                f"共 {count} 个文件，耗时 {elapsed:.2f} 秒，"
+                f"速度 {count / max(elapsed, 0.001):.0f} 个/秒"
             )
-            logger.info(f"【增量STRM生成】扫描本地媒体库文件完成: {target_dir}")
 
         local_tree_task_thread = threading.Thread(
             target=background_task,
@@ -285,7 +479,109 @@ class IncrementSyncStrmHelper:
         """
         while thread.is_alive():
             logger.info("【增量STRM生成】扫描本地媒体库运行中...")
-            time.sleep(10)
+            thread.join(timeout=10)
+
+    def __iter_pan_tree(self, pan_media_dir: str, target_dir: str):
+        """
+        迭代网盘目录树，产生 (本地路径, 网盘路径)
+        """
+        if self.snapshot_enabled:
+            return self.__iter_snapshot_tree(
+                pan_media_dir=pan_media_dir, target_dir=target_dir
+            )
+        return self.__itertree(pan_path=pan_media_dir, local_path=target_dir)
+
+    def __mediainfo_worker(self):
+        """
+        媒体信息文件下载线程，每满 50 个或空闲 5 秒下载一批
+
+        下载失败不会退出线程，持续读取队列直到收到结束标记，避免生产方阻塞
+        """
+        batch: List = []
+        while True:
+            try:
+                item = self.mediainfo_queue.get(timeout=5)
+            except Empty:
+                item = False
+            if item:
+                batch.append(item)
+            if batch and (not item or len(batch) >= 50):
+                try:
+                    count, fail_count, fail_dict = (
+                        self.mediainfodownloader.auto_downloader(downloads_list=batch)
+                    )
+                except Exception as e:
+                    logger.error(f"【增量STRM生成】媒体信息文件批量下载失败: {e}")
+                    count, fail_count, fail_dict = (
+                        0,
+                        len(batch),
+                        [str(i["path"]) for i in batch],
+                    )
+                self.mediainfo_count += count
+                self.mediainfo_fail_count += fail_count
+                self.mediainfo_fail_dict.extend(fail_dict)
+                batch = []
+            if item is None:
+                break
+
+    def __pipeline_strm_files(
+        self, pan_media_dir: str, target_dir: str, local_tree_task_thread
+    ):
+        """
+        流水线生成 STRM 文件
+
+        导出解析线程将网盘路径写入有界队列，当前线程在本地目录树就绪后边消费边生成
+        """
+        pan_queue: Queue = Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+        stop_event = threading.Event()
+
+        def put(item) -> bool:
+            while not stop_event.is_set():
+                try:
+                    pan_queue.put(item, timeout=1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def producer():
+            logger.info(f"【增量STRM生成】开始迭代网盘目录树: {pan_media_dir}")
+            try:
+                for paths in self.__iter_pan_tree(
+                    pan_media_dir=pan_media_dir, target_dir=target_dir
+                ):
+                    if not put(paths):
+                        return
+            except Exception as e:
+                put(e)
+                return
+            logger.info(f"【增量STRM生成】网盘目录树迭代完成: {pan_media_dir}")
+            put(None)
+
+        producer_thread = threading.Thread(target=producer, daemon=True)
+        producer_thread.start()
+
+        try:
+            # 等待生成本地目录树运行完成
+            self.__wait_generate_local_tree(local_tree_task_thread)
+            with open(self.local_tree, "r", encoding="utf-8") as f:
+                local_set = set(line.strip() for line in f)
+
+            def iter_addition_paths():
+                while True:
+                    item = pan_queue.get()
+                    if item is None:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    local_path, pan_path = item
+                    if local_path not in local_set:
+                        yield pan_path, local_path
+
+            for batch in self.__batch_addition_paths(iter_addition_paths()):
+                self.__handle_addition_batch(batch)
+        finally:
+            stop_event.set()
 
     def __generate_pan_tree(self, pan_media_dir: str, target_dir: str):
         """
@@ -300,57 +596,104 @@ class IncrementSyncStrmHelper:
 
         logger.info(f"【增量STRM生成】开始生成网盘目录树: {pan_media_dir}")
 
-        for path1, path2 in self.__itertree(
-            pan_path=pan_media_dir, local_path=target_dir
+        with (
+            tree.open_writer(self.pan_to_local_tree) as pan_to_local_writer,
+            tree.open_writer(self.pan_tree) as pan_writer,
         ):
-            tree.generate_tree_from_list([path1], self.pan_to_local_tree, append=True)
-            tree.generate_tree_from_list([path2], self.pan_tree, append=True)
+            for path1, path2 in self.__iter_pan_tree(
+                pan_media_dir=pan_media_dir, target_dir=target_dir
+            ):
+                pan_to_local_writer.write(path1)
+                pan_writer.write(path2)
 
         logger.info(f"【增量STRM生成】网盘目录树生成完成: {pan_media_dir}")
 
-    def __handle_addition_path(self, pan_path: str, local_path: str):
+    def __check_addition_path(self, pan_path: str) -> bool:
+        """
+        判断新增路径是否需要处理
+        """
+        if self.pan_transfer_enabled and self.pan_transfer_paths:
+            if self.pathmatchinghelper.get_run_transfer_path(
+                paths=self.pan_transfer_paths,
+                transfer_path=pan_path,
+            ):
+                logger.debug(f"【增量STRM生成】{pan_path} 为待整理目录下的路径，不做处理")
+                return False
+
+        suffix = Path(pan_path).suffix
+        if self.auto_download_mediainfo and suffix in self.download_mediaext:
+            return True
+        if suffix not in self.rmt_mediaext:
+            logger.warn(f"【增量STRM生成】跳过网盘路径: {pan_path}")
+            return False
+        return True
+
+    def __batch_addition_paths(self, pairs):
+        """
+        将新增路径分批，尽量保证同一目录下的文件处于同一批次
+        """
+        batch: List[Tuple[str, str]] = []
+        for pan_path, local_path in pairs:
+            if len(batch) >= self.PICKCODE_BATCH_SIZE and (
+                Path(pan_path).parent != Path(batch[-1][0]).parent
+            ):
+                yield batch
+                batch = []
+            batch.append((pan_path, local_path))
+        if batch:
+            yield batch
+
+    def __handle_addition_batch(self, pairs: List[Tuple[str, str]]):
         """
-        处理新增路径
+        批量处理新增路径 [(网盘路径, 本地路径)]
+        """
+        pairs = [pair for pair in pairs if self.__check_addition_path(pair[0])]
+        if not pairs:
+            return
+        pickcodes = self.__get_pickcodes([pan_path for pan_path, _ in pairs])
+        local_index_list: List[Dict] = []
+        try:
+            for pan_path, local_path in pairs:
+                self.__handle_addition_path(
+                    pan_path=pan_path,
+                    local_path=local_path,
+                    pickcode=pickcodes.get(pan_path),
+                    local_index_list=local_index_list,
+                )
+        finally:
+            self.localfilehelper.add_batch(local_index_list)
+
+    def __handle_addition_path(
+        self,
+        pan_path: str,
+        local_path: str,
+        pickcode: Optional[str],
+        local_index_list: List[Dict],
+    ):
+        """
+        处理新增路径，生成的文件索引追加到 local_index_list
         """
         try:
             pan_path = Path(pan_path)
             new_file_path = Path(local_path)
 
-            if self.pan_transfer_enabled and self.pan_transfer_paths:
-                if self.pathmatchinghelper.get_run_transfer_path(
-                    paths=self.pan_transfer_paths,
-                    transfer_path=str(pan_path),
-                ):
-                    logger.debug(
-                        f"【增量STRM生成】{pan_path} 为待整理目录下的路径，不做处理"
-                    )
-                    return
-
             if self.auto_download_mediainfo:
                 if pan_path.suffix in self.download_mediaext:
-                    pickcode = self.__get_pickcode(str(pan_path))
                     if not pickcode:
                         logger.error(
                             f"【增量STRM生成】{pan_path.name} 不存在 pickcode 值，无法下载该文件"
                         )
                         return
-                    self.download_mediainfo_list.append(
+                    self.mediainfo_queue.put(
                         {
                             "type": "local",
                             "pickcode": pickcode,
                             "path": local_path,
+                            "pan_path": str(pan_path),
                         }
                     )
                     return
 
-            if pan_path.suffix not in self.rmt_mediaext:
-                logger.warn(f"【增量STRM生成】跳过网盘路径: {pan_path}")
-                return
-
-            pickcode = self.__get_pickcode(str(pan_path))
-
-            new_file_path.parent.mkdir(parents=True, exist_ok=True)
-
             if not pickcode:
                 self.strm_fail_count += 1
                 self.strm_fail_dict[str(new_file_path)] = "不存在 pickcode 值"
@@ -371,8 +714,10 @@ class IncrementSyncStrmHelper:
             if self.strm_url_format == "pickname":
                 strm_url += f"&file_name={pan_path.name}"
 
-            with open(new_file_path, "w", encoding="utf-8") as file:
-                file.write(strm_url)
+            self.strm_writer.write(new_file_path, strm_url)
+            local_index_list.append(
+                self.localfilehelper.process_item(new_file_path, pan_path, pickcode)
+            )
             self.strm_count += 1
             logger.info(
                 "【增量STRM生成】生成 STRM 文件成功: %s",
@@ -409,6 +754,40 @@ class IncrementSyncStrmHelper:
         """
         生成 STRM 文件
         """
+        # 媒体信息文件边发现边下载
+        self.mediainfo_fail_dict = []
+        self.mediainfo_queue = Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+        mediainfo_thread = threading.Thread(
+            target=self.__mediainfo_worker, daemon=True
+        )
+        mediainfo_thread.start()
+        try:
+            if not self.__generate_strm_files(sync_strm_paths):
+                return
+        finally:
+            self.mediainfo_queue.put(None)
+            mediainfo_thread.join()
+
+        # 日志输出
+        if self.strm_fail_dict:
+            for path, error in self.strm_fail_dict.items():
+                logger.warn(f"【增量STRM生成】{path} 生成错误原因: {error}")
+        if self.mediainfo_fail_dict:
+            for path in self.mediainfo_fail_dict:
+                logger.warn(f"【增量STRM生成】{path} 下载错误")
+        logger.info(
+            f"【增量STRM生成】增量生成 STRM 文件完成，总共生成 {self.strm_count} 个 STRM 文件，下载 {self.mediainfo_count} 个媒体数据文件"
+        )
+        if self.strm_fail_count != 0 or self.mediainfo_fail_count != 0:
+            logger.warn(
+                f"【增量STRM生成】{self.strm_fail_count} 个 STRM 文件生成失败，{self.mediainfo_fail_count} 个媒体数据文件下载失败"
+            )
+        logger.info(f"【增量STRM生成】API 请求次数 {self.api_count} 次")
+
+    def __generate_strm_files(self, sync_strm_paths) -> bool:
+        """
+        按同步映射依次生成 STRM 文件
+        """
         tree = DirectoryTree()
         media_paths = sync_strm_paths.split("\n")
         for path in media_paths:
@@ -432,6 +811,15 @@ class IncrementSyncStrmHelper:
                     target_dir=target_dir
                 )
 
+                if self.tree_diff_mode != "external":
+                    # 边迭代网盘目录树边生成或者下载文件
+                    self.__pipeline_strm_files(
+                        pan_media_dir=pan_media_dir,
+                        target_dir=target_dir,
+                        local_tree_task_thread=local_tree_task_thread,
+                    )
+                    continue
+
                 # 生成网盘目录树文件
                 self.__generate_pan_tree(
                     pan_media_dir=pan_media_dir, target_dir=target_dir
@@ -441,41 +829,16 @@ class IncrementSyncStrmHelper:
                 self.__wait_generate_local_tree(local_tree_task_thread)
 
                 # 生成或者下载文件
-                for line in tree.compare_trees_lines(
-                    self.pan_to_local_tree, self.local_tree
-                ):
-                    self.__handle_addition_path(
-                        pan_path=str(tree.get_path_by_line_number(self.pan_tree, line)),
-                        local_path=str(
-                            tree.get_path_by_line_number(self.pan_to_local_tree, line)
-                        ),
+                for batch in self.__batch_addition_paths(
+                    tree.compare_trees_pairs_external(
+                        self.pan_to_local_tree, self.local_tree, self.pan_tree
                     )
+                ):
+                    self.__handle_addition_batch(batch)
             except Exception as e:
                 logger.error(f"【增量STRM生成】增量同步 STRM 文件失败: {e}")
-                return
-
-        # 下载媒体信息文件
-        self.mediainfo_count, self.mediainfo_fail_count, self.mediainfo_fail_dict = (
-            self.mediainfodownloader.auto_downloader(
-                downloads_list=self.download_mediainfo_list
-            )
-        )
-
-        # 日志输出
-        if self.strm_fail_dict:
-            for path, error in self.strm_fail_dict.items():
-                logger.warn(f"【增量STRM生成】{path} 生成错误原因: {error}")
-        if self.mediainfo_fail_dict:
-            for path in self.mediainfo_fail_dict:
-                logger.warn(f"【增量STRM生成】{path} 下载错误")
-        logger.info(
-            f"【增量STRM生成】增量生成 STRM 文件完成，总共生成 {self.strm_count} 个 STRM 文件，下载 {self.mediainfo_count} 个媒体数据文件"
-        )
-        if self.strm_fail_count != 0 or self.mediainfo_fail_count != 0:
-            logger.warn(
-                f"【增量STRM生成】{self.strm_fail_count} 个 STRM 文件生成失败，{self.mediainfo_fail_count} 个媒体数据文件下载失败"
-            )
-        logger.info(f"【增量STRM生成】API 请求次数 {self.api_count} 次")
+                return False
+        return True
 
     def get_generate_total(self):
         """
@@ -507,6 +870,10 @@ class FullSyncStrmHelper:
         remove_unless_strm: bool,
         mediainfodownloader: MediaInfoDownloader,
         auto_download_mediainfo: bool = False,
+        tree_diff_mode: str = "memory",
+        local_index_enabled: bool = False,
+        strm_writer: Optional[StrmWriter] = None,
+        db_staging: bool = False,
     ):
         self.rmt_mediaext = [
             f".{ext.strip()}" for ext in user_rmt_mediaext.replace("，", ",").split(",")
@@ -522,6 +889,11 @@ class FullSyncStrmHelper:
         self.strm_fail_count = 0
         self.mediainfo_fail_count = 0
         self.remove_unless_strm_count = 0
+        self.strm_unchanged_count = 0
+        self.tree_diff_mode = tree_diff_mode
+        self.local_index_enabled = local_index_enabled
+        self.db_staging = db_staging
+        self.localfilehelper = LocalFileDbHelper()
         self.strm_fail_dict: Dict[str, str] = {}
         self.mediainfo_fail_dict: List = None
         self.server_address = server_address.rstrip("/")
@@ -534,6 +906,7 @@ class FullSyncStrmHelper:
         self.pathmatchinghelper = PathMatchingHelper()
         self.mediainfodownloader = mediainfodownloader
         self.download_mediainfo_list = []
+        self.strm_writer = strm_writer or StrmWriter()
 
         temp_path = settings.PLUGIN_DATA_PATH / "p115strmhelper" / "temp"
         self.local_tree = temp_path / "local_tree.txt"
@@ -560,10 +933,83 @@ class FullSyncStrmHelper:
                         shutil.rmtree(parent_path)
                         logger.warn(f"【全量STRM生成】本地空目录 {parent_path} 已删除")
 
+    @staticmethod
+    def __strm_unchanged(file_path: Path, strm_url: str) -> bool:
+        """
+        判断已存在的 STRM 文件内容是否与新内容一致
+        """
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                return file.read(len(strm_url) + 1) == strm_url
+        except (OSError, UnicodeDecodeError):
+            return False
+
+    def __on_strm_written(self, file_path: Path, error: Optional[Exception]):
+        """
+        STRM 文件写入完成回调
+        """
+        if error:
+            logger.error(
+                "【全量STRM生成】生成 STRM 文件失败: %s  %s", str(file_path), error
+            )
+            return
+        self.strm_count += 1
+        logger.info("【全量STRM生成】生成 STRM 文件成功: %s", str(file_path))
+
+    def __finish_strm_writer(self):
+        """
+        等待 STRM 文件写入完成，汇总失败信息并从本地索引移除写入失败的文件
+        """
+        self.strm_writer.close()
+        self.strm_fail_count += self.strm_writer.fail_count
+        self.strm_fail_dict.update(self.strm_writer.fail_dict)
+        failed = list(self.strm_writer.fail_dict)
+        for failed_batch in batched(failed, 7_000):
+            self.localfilehelper.remove_batch(list(failed_batch))
+
     def generate_strm_files(self, full_sync_strm_paths):
         """
         生成 STRM 文件
         """
+        try:
+            if not self.__generate_strm_files(full_sync_strm_paths):
+                return False
+        finally:
+            self.__finish_strm_writer()
+
+        self.mediainfo_count, self.mediainfo_fail_count, self.mediainfo_fail_dict = (
+            self.mediainfodownloader.auto_downloader(
+                downloads_list=self.download_mediainfo_list
+            )
+        )
+        if self.strm_fail_dict:
+            for path, error in self.strm_fail_dict.items():
+                logger.warn(f"【全量STRM生成】{path} 生成错误原因: {error}")
+        if self.mediainfo_fail_dict:
+            for path in self.mediainfo_fail_dict:
+                logger.warn(f"【全量STRM生成】{path} 下载错误")
+        logger.info(
+            f"【全量STRM生成】全量生成 STRM 文件完成，总共生成 {self.strm_count} 个 STRM 文件，下载 {self.mediainfo_count} 个媒体数据文件"
+        )
+        if self.strm_unchanged_count != 0:
+            logger.info(
+                f"【全量STRM生成】{self.strm_unchanged_count} 个 STRM 文件内容未变化，跳过写入"
+            )
+        if self.strm_fail_count != 0 or self.mediainfo_fail_count != 0:
+            logger.warn(
+                f"【全量STRM生成】{self.strm_fail_count} 个 STRM 文件生成失败，{self.mediainfo_fail_count} 个媒体数据文件下载失败"
+            )
+        if self.remove_unless_strm_count != 0:
+            logger.warn(
+                f"【全量STRM生成】清理 {self.remove_unless_strm_count} 个失效 STRM 文件"
+            )
+
+        return True
+
+    def __generate_strm_files(self, full_sync_strm_paths) -> bool:
+        """
+        按同步映射依次生成 STRM 文件
+        """
         tree = DirectoryTree()
         media_paths = full_sync_strm_paths.split("\n")
         for path in media_paths:
@@ -583,14 +1029,34 @@ class FullSyncStrmHelper:
                     """
                     后台运行任务
                     """
+                    if self.local_index_enabled and self.localfilehelper.is_seeded(
+                        target_dir, [".strm"]
+                    ):
+                        count = self.localfilehelper.export_tree(
+                            local_dir=target_dir,
+                            output_file=local_tree,
+                            extensions=[".strm"],
+                        )
+                        logger.info(
+                            f"【全量STRM生成】从本地索引读取媒体库文件完成: {target_dir}，共 {count} 个文件"
+                        )
+                        return
                     logger.info(f"【全量STRM生成】开始扫描本地媒体库文件: {target_dir}")
-                    tree.scan_directory_to_tree(
+                    count, elapsed = tree.scan_directory_to_tree(
                         root_path=target_dir,
                         output_file=local_tree,
                         append=False,
                         extensions=[".strm"],
                     )
-                    logger.info(f"【全量STRM生成】扫描本地媒体库文件完成: {target_dir}")
+                    logger.info(
+                        f"【全量STRM生成】扫描本地媒体库文件完成: {target_dir}，"
+                        f"共 {count} 个文件，耗时 {elapsed:.2f} 秒，"
+                        f"速度 {count / max(elapsed, 0.001):.0f} 个/秒"
+                    )
+                    if self.local_index_enabled:
+                        # 本地索引未初始化时使用扫描结果初始化
+                        self.localfilehelper.add_tree(local_tree)
+                        self.localfilehelper.mark_seeded(target_dir, [".strm"])
 
                 local_tree_task_thread = threading.Thread(
                     target=background_task,
@@ -608,16 +1074,29 @@ class FullSyncStrmHelper:
                 logger.error(f"【全量STRM生成】网盘媒体目录 ID 获取失败: {e}")
                 return False
 
+            pan_tree_writer = None
+            if self.remove_unless_strm:
+                pan_tree_writer = tree.open_writer(self.pan_tree, append=True).open()
+
+            if self.db_staging and not self.databasehelper.staging_lock.acquire(
+                blocking=False
+            ):
+                logger.info("【全量STRM生成】等待其它全量同步完成数据库替换...")
+                self.databasehelper.staging_lock.acquire()
+
             try:
+                if self.db_staging:
+                    self.databasehelper.clear_staging()
+
                 for batch in batched(
                     iter_files_with_path(self.client, cid=parent_id, cooldown=2), 7_000
                 ):
                     processed: List = []
+                    seen = set()
                     path_list: List = []
+                    local_index_list: List = []
                     for item in batch:
-                        _process_item = self.databasehelper.process_item(item)
-                        if _process_item not in processed:
-                            processed.extend(_process_item)
+                        processed.extend(self.databasehelper.process_item(item, seen))
                         try:
                             if item["is_dir"] or item["is_directory"]:
                                 continue
@@ -653,7 +1132,8 @@ class FullSyncStrmHelper:
                             if self.auto_download_mediainfo:
                                 if file_path.suffix in self.download_mediaext:
                                     if file_path.exists():
-                                        if self.overwrite_mode == "never":
+                                        # 媒体信息文件无法在本地比较内容，仅更新模式下同样跳过
+                                        if self.overwrite_mode in ("never", "changed"):
                                             logger.warn(
                                                 f"【全量STRM生成】{file_path} 已存在，覆盖模式 {self.overwrite_mode}，跳过此路径"
                                             )
@@ -673,6 +1153,7 @@ class FullSyncStrmHelper:
                                             "type": "local",
                                             "pickcode": pickcode,
                                             "path": file_path,
+                                            "pan_path": item["path"],
                                         }
                                     )
                                     continue
@@ -692,8 +1173,16 @@ class FullSyncStrmHelper:
                                     logger.warn(
                                         f"【全量STRM生成】{new_file_path} 已存在，覆盖模式 {self.overwrite_mode}，跳过此路径"
                                     )
+                                    local_index_list.append(
+                                        self.localfilehelper.process_item(
+                                            new_file_path,
+                                            item["path"],
+                                            item.get("pickcode")
+                                            or item.get("pick_code"),
+                                        )
+                                    )
                                     continue
-                                else:
+                                elif self.overwrite_mode != "changed":
                                     logger.warn(
                                         f"【全量STRM生成】{new_file_path} 已存在，覆盖模式 {self.overwrite_mode}"
                                     )
@@ -702,8 +1191,6 @@ class FullSyncStrmHelper:
                             if not pickcode:
                                 pickcode = item["pick_code"]
 
-                            new_file_path.parent.mkdir(parents=True, exist_ok=True)
-
                             if not pickcode:
                                 self.strm_fail_count += 1
                                 self.strm_fail_dict[str(new_file_path)] = (
@@ -722,16 +1209,27 @@ class FullSyncStrmHelper:
                                     f"【全量STRM生成】错误的 pickcode 值 {pickcode}，无法生成 STRM 文件"
                                 )
                                 continue
-                            strm_url = f"{self.server_address}/api/v1/plugin/P115StrmHelper/redirect_url?apikey={settings.API_TOKEN}&pickcode={pickcode}"
-                            if self.strm_url_format == "pickname":
-                                strm_url += f"&file_name={original_file_name}"
-
-                            with open(new_file_path, "w", encoding="utf-8") as file:
-                                file.write(strm_url)
-                            self.strm_count += 1
-                            logger.info(
-                                "【全量STRM生成】生成 STRM 文件成功: %s",
-                                str(new_file_path),
+                            strm_url = self.__strm_url(pickcode, original_file_name)
+
+                            if (
+                                self.overwrite_mode == "changed"
+                                and self.__strm_unchanged(new_file_path, strm_url)
+                            ):
+                                self.strm_unchanged_count += 1
+                                local_index_list.append(
+                                    self.localfilehelper.process_item(
+                                        new_file_path, item["path"], pickcode
+                                    )
+                                )
+                                continue
+
+                            self.strm_writer.submit(
+                                new_file_path, strm_url, self.__on_strm_written
+                            )
+                            local_index_list.append(
+                                self.localfilehelper.process_item(
+                                    new_file_path, item["path"], pickcode
+                                )
                             )
                         except Exception as e:
                             logger.error(
@@ -743,51 +1241,185 @@ class FullSyncStrmHelper:
                             self.strm_fail_dict[str(new_file_path)] = str(e)
                             continue
 
-                    self.databasehelper.upsert_batch(processed)
-
-                    if self.remove_unless_strm:
-                        tree.generate_tree_from_list(
-                            path_list, self.pan_tree, append=True
-                        )
+                    if self.db_staging:
+                        self.databasehelper.stage_batch(processed)
+                    else:
+                        self.databasehelper.upsert_batch(processed)
+                    self.localfilehelper.add_batch(local_index_list)
+
+                    if pan_tree_writer:
+                        pan_tree_writer.write_many(path_list)
+
+                if self.db_staging:
+                    start_time = time.perf_counter()
+                    self.databasehelper.swap_staging(pan_media_dir)
+                    logger.info(
+                        f"【全量STRM生成】数据库替换完成: {pan_media_dir}，"
+                        f"耗时 {time.perf_counter() - start_time:.2f} 秒"
+                    )
 
             except Exception as e:
                 logger.error(f"【全量STRM生成】全量生成 STRM 文件失败: {e}")
                 return False
+            finally:
+                if self.db_staging:
+                    self.databasehelper.staging_lock.release()
+                if pan_tree_writer:
+                    pan_tree_writer.close()
+                self.strm_writer.wait()
 
             if self.remove_unless_strm:
                 while local_tree_task_thread.is_alive():
                     logger.info("【全量STRM生成】扫描本地媒体库运行中...")
                     time.sleep(10)
+                if self.tree_diff_mode == "external":
+                    compare_trees = tree.compare_trees_external
+                else:
+                    compare_trees = tree.compare_trees
+                removed_list: List = []
                 try:
-                    for path in tree.compare_trees(self.local_tree, self.pan_tree):
+                    for path in compare_trees(self.local_tree, self.pan_tree):
                         logger.info(f"【全量STRM生成】清理无效 STRM 文件: {path}")
                         Path(path).unlink(missing_ok=True)
+                        removed_list.append(path)
                         self.__remove_parent_dir(file_path=Path(path))
                         self.remove_unless_strm_count += 1
                 except Exception as e:
                     logger.error(f"【全量STRM生成】清理无效 STRM 文件失败: {e}")
+                for removed_batch in batched(removed_list, 7_000):
+                    self.localfilehelper.remove_batch(list(removed_batch))
+
+        return True
+
+    def __strm_url(self, pickcode: str, file_name: str) -> str:
+        """
+        生成 STRM 文件内容
+        """
+        strm_url = f"{self.server_address}/api/v1/plugin/P115StrmHelper/redirect_url?apikey={settings.API_TOKEN}&pickcode={pickcode}"
+        if self.strm_url_format == "pickname":
+            strm_url += f"&file_name={file_name}"
+        return strm_url
+
+    def rebuild_strm_files(self, full_sync_strm_paths):
+        """
+        从数据库重建 STRM 文件，不请求115接口
+        """
+        try:
+            if not self.__rebuild_strm_files(full_sync_strm_paths):
+                return False
+        finally:
+            self.__finish_strm_writer()
 
-        self.mediainfo_count, self.mediainfo_fail_count, self.mediainfo_fail_dict = (
-            self.mediainfodownloader.auto_downloader(
-                downloads_list=self.download_mediainfo_list
-            )
-        )
         if self.strm_fail_dict:
             for path, error in self.strm_fail_dict.items():
                 logger.warn(f"【全量STRM生成】{path} 生成错误原因: {error}")
-        if self.mediainfo_fail_dict:
-            for path in self.mediainfo_fail_dict:
-                logger.warn(f"【全量STRM生成】{path} 下载错误")
         logger.info(
-            f"【全量STRM生成】全量生成 STRM 文件完成，总共生成 {self.strm_count} 个 STRM 文件，下载 {self.mediainfo_count} 个媒体数据文件"
+            f"【全量STRM生成】从数据库重建 STRM 文件完成，总共生成 {self.strm_count} 个 STRM 文件，"
+            f"{self.strm_unchanged_count} 个 STRM 文件内容未变化"
         )
-        if self.strm_fail_count != 0 or self.mediainfo_fail_count != 0:
-            logger.warn(
-                f"【全量STRM生成】{self.strm_fail_count} 个 STRM 文件生成失败，{self.mediainfo_fail_count} 个媒体数据文件下载失败"
-            )
-        if self.remove_unless_strm_count != 0:
-            logger.warn(
-                f"【全量STRM生成】清理 {self.remove_unless_strm_count} 个失效 STRM 文件"
+        if self.strm_fail_count != 0:
+            logger.warn(f"【全量STRM生成】{self.strm_fail_count} 个 STRM 文件生成失败")
+
+        return True
+
+    def __rebuild_strm_files(self, full_sync_strm_paths) -> bool:
+        """
+        按同步映射依次从数据库重建 STRM 文件
+        """
+        media_paths = full_sync_strm_paths.split("\n")
+        for path in media_paths:
+            if not path:
+                continue
+            parts = path.split("#", 1)
+            # 网盘目录为根目录时去除结尾 / 后为空
+            pan_media_dir = parts[1].rstrip("/") or "/"
+            target_dir = parts[0]
+
+            logger.info(f"【全量STRM生成】开始从数据库重建 STRM 文件: {pan_media_dir}")
+            start_time = time.perf_counter()
+            total = 0
+            try:
+                for batch in batched(
+                    self.databasehelper.iter_files_by_prefix(
+                        pan_media_dir.rstrip("/") + "/"
+                    ),
+                    7_000,
+                ):
+                    local_index_list: List = []
+                    for pan_path, pickcode in batch:
+                        total += 1
+                        if self.pan_transfer_enabled and self.pan_transfer_paths:
+                            if self.pathmatchinghelper.get_run_transfer_path(
+                                paths=self.pan_transfer_paths,
+                                transfer_path=pan_path,
+                            ):
+                                continue
+                        file_path = Path(target_dir) / Path(pan_path).relative_to(
+                            pan_media_dir
+                        )
+                        if file_path.suffix not in self.rmt_mediaext:
+                            continue
+                        new_file_path = file_path.with_suffix(".strm")
+                        try:
+                            if (
+                                self.overwrite_mode == "never"
+                                and new_file_path.exists()
+                            ):
+                                local_index_list.append(
+                                    self.localfilehelper.process_item(
+                                        new_file_path, pan_path, pickcode
+                                    )
+                                )
+                                continue
+                            if not (
+                                pickcode
+                                and len(pickcode) == 17
+                                and str(pickcode).isalnum()
+                            ):
+                                self.strm_fail_count += 1
+                                self.strm_fail_dict[str(new_file_path)] = (
+                                    f"错误的 pickcode 值 {pickcode}"
+                                )
+                                continue
+                            strm_url = self.__strm_url(pickcode, file_path.name)
+
+                            if (
+                                self.overwrite_mode == "changed"
+                                and self.__strm_unchanged(new_file_path, strm_url)
+                            ):
+                                self.strm_unchanged_count += 1
+                                local_index_list.append(
+                                    self.localfilehelper.process_item(
+                                        new_file_path, pan_path, pickcode
+                                    )
+                                )
+                                continue
+
+                            self.strm_writer.submit(
+                                new_file_path, strm_url, self.__on_strm_written
+                            )
+                            local_index_list.append(
+                                self.localfilehelper.process_item(
+                                    new_file_path, pan_path, pickcode
+                                )
+                            )
+                        except Exception as e:
+                            logger.error(
+                                "【全量STRM生成】重建 STRM 文件失败: %s  %s",
+                                str(new_file_path),
+                                e,
+                            )
+                            self.strm_fail_count += 1
+                            self.strm_fail_dict[str(new_file_path)] = str(e)
+                    self.localfilehelper.add_batch(local_index_list)
+            except Exception as e:
+                logger.error(f"【全量STRM生成】从数据库重建 STRM 文件失败: {e}")
+                return False
+            finally:
+                self.strm_writer.wait()
+            logger.info(
+                f"【全量STRM生成】从数据库重建完成: {pan_media_dir}，"
+                f"数据库文件 {total} 个，耗时 {time.perf_counter() - start_time:.2f} 秒"
             )
 
         return True
@@ -802,6 +1434,7 @@ class FullSyncStrmHelper:
             self.strm_fail_count,
             self.mediainfo_fail_count,
             self.remove_unless_strm_count,
+            self.strm_unchanged_count,
         )
 
 
@@ -821,6 +1454,7 @@ class ShareStrmHelper:
         strm_url_format: str,
         mediainfodownloader: MediaInfoDownloader,
         auto_download_mediainfo: bool = False,
+        strm_writer: Optional[StrmWriter] = None,
     ):
         self.rmt_mediaext = [
             f".{ext.strip()}" for ext in user_rmt_mediaext.replace("，", ",").split(",")
@@ -843,7 +1477,10 @@ class ShareStrmHelper:
         self.strm_url_format = strm_url_format
         self.pathmatchinghelper = PathMatchingHelper()
         self.mediainfodownloader = mediainfodownloader
+        self.localfilehelper = LocalFileDbHelper()
+        self.local_index_list: List[Dict] = []
         self.download_mediainfo_list = []
+        self.strm_writer = strm_writer or StrmWriter()
 
     def generate_strm_files(
         self,
@@ -862,6 +1499,7 @@ class ShareStrmHelper:
                 str(file_path).replace(str(self.local_media_path), "", 1),
             )
             return
+        pan_file_path = file_path
         file_path = Path(self.local_media_path) / Path(file_path).relative_to(
             self.share_media_path
         )
@@ -879,6 +1517,7 @@ class ShareStrmHelper:
                             "receive_code": receive_code,
                             "file_id": file_id,
                             "path": file_path,
+                            "pan_path": pan_file_path,
                         }
                     )
                     return
@@ -890,8 +1529,6 @@ class ShareStrmHelper:
                 )
                 return
 
-            new_file_path.parent.mkdir(parents=True, exist_ok=True)
-
             if not file_id:
                 logger.error(
                     f"【分享STRM生成】{original_file_name} 不存在 id 值，无法生成 STRM 文件"
@@ -917,8 +1554,10 @@ class ShareStrmHelper:
             if self.strm_url_format == "pickname":
                 strm_url += f"&file_name={pan_file_name}"
 
-            with open(new_file_path, "w", encoding="utf-8") as file:
-                file.write(strm_url)
+            self.strm_writer.write(new_file_path, strm_url)
+            self.local_index_list.append(
+                self.localfilehelper.process_item(new_file_path, pan_file_path)
+            )
             self.strm_count += 1
             logger.info("【分享STRM生成】生成 STRM 文件成功: %s", str(new_file_path))
         except Exception as e:
@@ -939,7 +1578,29 @@ class ShareStrmHelper:
         receive_code: str = "",
     ):
         """
-        获取分享文件，生成 STRM
+        获取分享文件，生成 STRM，每个目录处理完成后批量写入文件索引
+        """
+        try:
+            self.__iter_share_dir(
+                cid=cid,
+                current_path=current_path,
+                share_code=share_code,
+                receive_code=receive_code,
+            )
+        finally:
+            if self.local_index_list:
+                self.localfilehelper.add_batch(self.local_index_list)
+                self.local_index_list = []
+
+    def __iter_share_dir(
+        self,
+        cid: int,
+        current_path: str,
+        share_code: str,
+        receive_code: str,
+    ):
+        """
+        遍历分享目录生成 STRM
         """
         for item in share_iterdir(
             self.client, receive_code=receive_code, share_code=share_code, cid=int(cid)
@@ -1,4 +1,74 @@
+import heapq
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from pathlib import Path
+from tempfile import TemporaryDirectory
+
+
+class TreeWriter:
+    """
+    目录树流式写入器
+
+    保持文件句柄常驻并使用大写入缓冲区，避免逐条写入时频繁打开关闭文件
+    """
+
+    # 默认写入缓冲区大小 1MB
+    DEFAULT_BUFFERING = 1024 * 1024
+
+    def __init__(self, output_file, append=False, buffering=DEFAULT_BUFFERING):
+        """
+        :param output_file: 输出文件路径
+        :param append: 是否追加模式 (默认覆盖)
+        :param buffering: 写入缓冲区大小
+        """
+        self.output_file = output_file
+        self.mode = "a" if append else "w"
+        self.buffering = buffering
+        self.count = 0
+        self._file = None
+
+    def open(self):
+        """
+        打开文件
+        """
+        if self._file is None:
+            self._file = open(
+                self.output_file,
+                self.mode,
+                encoding="utf-8",
+                buffering=self.buffering,
+            )
+        return self
+
+    def write(self, file_path):
+        """
+        写入单条路径
+        """
+        self._file.write(f"{file_path}\n")
+        self.count += 1
+
+    def write_many(self, file_list):
+        """
+        写入多条路径
+        """
+        for file_path in file_list:
+            self.write(file_path)
+
+    def close(self):
+        """
+        刷新缓冲区并关闭文件
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
 
 class DirectoryTree:
@@ -6,18 +76,62 @@ class DirectoryTree:
     目录树
     """
 
+    # 外部排序单个分块最大行数
+    DEFAULT_CHUNK_LINES = 200_000
+    # 本地目录扫描线程数
+    DEFAULT_SCAN_WORKERS = 8
+
     @staticmethod
-    def scan_directory_to_tree(root_path, output_file, append=False, extensions=None):
+    def _scan_directory(path, extensions):
+        """
+        扫描单层目录，使用 DirEntry 类型信息避免额外 stat
+
+        :param path: 目录路径
+        :param extensions: 要包含的文件后缀名集合
+        :return: (文件列表, 子目录列表)
+        """
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file():
+                            if (
+                                extensions is None
+                                or os.path.splitext(entry.name)[1].lower() in extensions
+                            ):
+                                files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return files, subdirs
+
+    @staticmethod
+    def scan_directory_to_tree(
+        root_path,
+        output_file,
+        append=False,
+        extensions=None,
+        max_workers=DEFAULT_SCAN_WORKERS,
+    ):
         """
         扫描本地目录生成目录树到文件，可过滤指定后缀名文件
 
+        多线程并发扫描子目录，结果按目录分批写入，写入顺序不固定
+
         :param root_path: 要扫描的根目录
         :param output_file: 输出文件路径
         :param append: 是否追加模式 (默认覆盖)
         :param extensions: 要包含的文件后缀名列表
+        :param max_workers: 扫描线程数
+        :return: (文件数量, 耗时秒数)
         """
         root = Path(root_path).resolve()
-        mode = "a" if append else "w"
+        start_time = time.perf_counter()
 
         if extensions is not None:
             extensions = {
@@ -25,11 +139,42 @@ class DirectoryTree:
                 for ext in extensions
             }
 
-        with open(output_file, mode, encoding="utf-8") as f_out:
-            for path in root.rglob("*"):
-                if path.is_file():
-                    if extensions is None or path.suffix.lower() in extensions:
-                        f_out.write(f"{str(path)}\n")
+        with (
+            DirectoryTree.open_writer(output_file, append=append) as writer,
+            ThreadPoolExecutor(max_workers=max_workers) as executor,
+        ):
+            pending = set()
+            if root.is_dir():
+                pending.add(
+                    executor.submit(
+                        DirectoryTree._scan_directory, str(root), extensions
+                    )
+                )
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subdirs = future.result()
+                    writer.write_many(files)
+                    pending.update(
+                        executor.submit(
+                            DirectoryTree._scan_directory, subdir, extensions
+                        )
+                        for subdir in subdirs
+                    )
+
+        return writer.count, time.perf_counter() - start_time
+
+    @staticmethod
+    def open_writer(output_file, append=False, buffering=TreeWriter.DEFAULT_BUFFERING):
+        """
+        打开目录树流式写入器，配合 with 语句使用
+
+        :param output_file: 输出文件路径
+        :param append: 是否追加模式 (默认覆盖)
+        :param buffering: 写入缓冲区大小
+        :return: TreeWriter
+        """
+        return TreeWriter(output_file, append=append, buffering=buffering)
 
     @staticmethod
     def generate_tree_from_list(file_list, output_file, append=False):
@@ -82,6 +227,139 @@ class DirectoryTree:
                 if file_path not in tree2_set:
                     yield line_num
 
+    @staticmethod
+    def _external_sort(lines, output_file, temp_dir, chunk_lines):
+        """
+        外部排序，分块排序写入临时文件后多路归并
+
+        :param lines: 行迭代器（不含换行符）
+        :param output_file: 排序后输出文件
+        :param temp_dir: 临时文件目录
+        :param chunk_lines: 单个分块最大行数
+        """
+        chunk_files = []
+        lines = iter(lines)
+        while True:
+            chunk = list(islice(lines, chunk_lines))
+            if not chunk:
+                break
+            chunk.sort()
+            chunk_file = Path(temp_dir) / f"{Path(output_file).name}.{len(chunk_files)}"
+            with open(chunk_file, "w", encoding="utf-8") as f_chunk:
+                f_chunk.writelines(f"{line}\n" for line in chunk)
+            chunk_files.append(chunk_file)
+            del chunk
+
+        chunk_handles = [open(f, "r", encoding="utf-8") for f in chunk_files]
+        try:
+            with open(
+                output_file,
+                "w",
+                encoding="utf-8",
+                buffering=TreeWriter.DEFAULT_BUFFERING,
+            ) as f_out:
+                f_out.writelines(
+                    heapq.merge(*chunk_handles, key=lambda x: x.rstrip("\n"))
+                )
+        finally:
+            for handle in chunk_handles:
+                handle.close()
+            for chunk_file in chunk_files:
+                chunk_file.unlink(missing_ok=True)
+
+    @staticmethod
+    def _merge_difference(sorted_file1, sorted_file2, key=None):
+        """
+        归并比较两个已排序文件，找出sorted_file1有而sorted_file2没有的行
+
+        :param sorted_file1: 第一个已排序文件
+        :param sorted_file2: 第二个已排序文件
+        :param key: 从第一个文件的行中取出比较值的函数
+        :return: 生成器，产生第一个文件中的行（不含换行符）
+        """
+        with (
+            open(sorted_file1, "r", encoding="utf-8") as f1,
+            open(sorted_file2, "r", encoding="utf-8") as f2,
+        ):
+            line2 = f2.readline()
+            value2 = line2.rstrip("\n") if line2 else None
+            for line1 in f1:
+                line1 = line1.rstrip("\n")
+                value1 = key(line1) if key else line1
+                while value2 is not None and value2 < value1:
+                    line2 = f2.readline()
+                    value2 = line2.rstrip("\n") if line2 else None
+                if value2 != value1:
+                    yield line1
+
+    @staticmethod
+    def compare_trees_external(
+        tree_file1, tree_file2, chunk_lines=DEFAULT_CHUNK_LINES
+    ):
+        """
+        外部排序归并比较两个目录树文件，找出tree_file1有而tree_file2没有的文件
+
+        内存占用只与分块行数有关，适用于超出内存的目录树
+
+        :param tree_file1: 第一个目录树文件
+        :param tree_file2: 第二个目录树文件
+        :param chunk_lines: 排序分块最大行数
+        :return: 生成器，产生差异文件路径
+        """
+        with TemporaryDirectory(dir=Path(tree_file1).parent) as temp_dir:
+            sorted_file1 = Path(temp_dir) / "sorted_1.txt"
+            sorted_file2 = Path(temp_dir) / "sorted_2.txt"
+            with open(tree_file1, "r", encoding="utf-8") as f1:
+                DirectoryTree._external_sort(
+                    (line.strip() for line in f1), sorted_file1, temp_dir, chunk_lines
+                )
+            with open(tree_file2, "r", encoding="utf-8") as f2:
+                DirectoryTree._external_sort(
+                    (line.strip() for line in f2), sorted_file2, temp_dir, chunk_lines
+                )
+            yield from DirectoryTree._merge_difference(sorted_file1, sorted_file2)
+
+    @staticmethod
+    def compare_trees_pairs_external(
+        tree_file1, tree_file2, pair_tree_file, chunk_lines=DEFAULT_CHUNK_LINES
+    ):
+        """
+        外部排序归并比较两个目录树文件，找出tree_file1有而tree_file2没有的文件，
+        并同步返回 pair_tree_file 中的对应行
+
+        :param tree_file1: 第一个目录树文件
+        :param tree_file2: 第二个目录树文件
+        :param pair_tree_file: 与第一个目录树文件行对应的目录树文件
+        :param chunk_lines: 排序分块最大行数
+        :return: 生成器，产生 (pair_tree_file 路径, tree_file1 路径)
+        """
+        with TemporaryDirectory(dir=Path(tree_file1).parent) as temp_dir:
+            sorted_file1 = Path(temp_dir) / "sorted_1.txt"
+            sorted_file2 = Path(temp_dir) / "sorted_2.txt"
+            # 以 \0 拼接成对路径，排序结果与单独按 tree_file1 路径排序一致
+            with (
+                open(tree_file1, "r", encoding="utf-8") as f1,
+                open(pair_tree_file, "r", encoding="utf-8") as f_pair,
+            ):
+                DirectoryTree._external_sort(
+                    (
+                        f"{line.strip()}\0{pair_line.strip()}"
+                        for line, pair_line in zip(f1, f_pair)
+                    ),
+                    sorted_file1,
+                    temp_dir,
+                    chunk_lines,
+                )
+            with open(tree_file2, "r", encoding="utf-8") as f2:
+                DirectoryTree._external_sort(
+                    (line.strip() for line in f2), sorted_file2, temp_dir, chunk_lines
+                )
+            for line in DirectoryTree._merge_difference(
+                sorted_file1, sorted_file2, key=lambda x: x.split("\0", 1)[0]
+            ):
+                file_path, pair_path = line.split("\0", 1)
+                yield pair_path, file_path
+
     @staticmethod
     def get_path_by_line_number(tree_file, line_number):
         """